@@ -3,6 +3,7 @@ import { useState, useEffect, useRef } from 'react';
 import { useRouter } from 'next/navigation';
 import { supabase } from '@/lib/supabaseClient';
 import Image from 'next/image';
+import { slugify } from '@/lib/slugify';
 
 export default function AdminPage() {
   const [projects, setProjects] = useState([]);
@@ -149,6 +150,31 @@ export default function AdminPage() {
     }
 
     try {
+      // Upload new gallery images in one parallel batch instead of one by one
+      // inside the create/update route.
+      let uploadedGalleryUrls = [];
+      let galleryErrors = [];
+      if (galleryFiles.length > 0) {
+        const batch = new FormData();
+        batch.append('folder', 'gallery');
+        batch.append('projectSlug', slugify(formData.name) || 'temp');
+        // Lets the proxy reuse images this project already has; a new
+        // project's final slug is not known yet, so creates upload every file.
+        if (editingProject) batch.append('projectId', editingProject.id);
+        for (const gf of galleryFiles) {
+          batch.append('files', gf);
+        }
+        const uploadResponse = await fetch('/api/admin/upload/batch', { method: 'POST', body: batch });
+        const uploadResult = await uploadResponse.json();
+        if (!uploadResponse.ok) {
+          setError(uploadResult.error || 'Error uploading gallery images');
+          return;
+        }
+        // Files storage failed on come back as null; save the rest.
+        uploadedGalleryUrls = uploadResult.urls.filter(Boolean);
+        galleryErrors = uploadResult.errors || [];
+      }
+
       const body = new FormData();
 
       // Text fields
@@ -169,19 +195,15 @@ export default function AdminPage() {
         body.append('cover_image', coverFile);
       }
 
-      // Gallery files
-      for (const gf of galleryFiles) {
-        body.append('gallery_images', gf);
-      }
-
       let endpoint, method;
 
       if (editingProject) {
         body.append('id', editingProject.id);
-        body.append('existing_gallery_urls', JSON.stringify(existingGalleryUrls));
+        body.append('existing_gallery_urls', JSON.stringify([...existingGalleryUrls, ...uploadedGalleryUrls]));
         endpoint = '/api/admin/projects/update';
         method = 'PUT';
       } else {
+        body.append('gallery_urls', JSON.stringify(uploadedGalleryUrls));
         endpoint = '/api/admin/projects/create';
         method = 'POST';
       }
@@ -194,6 +216,9 @@ export default function AdminPage() {
         await fetchProjects();
         resetForm();
         setShowForm(false);
+        if (galleryErrors.length > 0) {
+          setError(`${galleryErrors.length} gallery image(s) could not be uploaded: ${galleryErrors[0].error}`);
+        }
       } else {
         setError(result.error || 'Error saving project');
       }
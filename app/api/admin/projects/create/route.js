@@ -99,8 +99,21 @@ export async function POST(request) {
     // Upload cover image
     const coverUrl = await uploadFile(coverFile, 'covers', slug);
 
-    // Upload gallery images
+    // Gallery images already uploaded through /api/admin/upload/batch
     const galleryUrls = [];
+    const galleryUrlsJson = formData.get('gallery_urls');
+    if (galleryUrlsJson) {
+      try {
+        const parsed = JSON.parse(galleryUrlsJson);
+        if (Array.isArray(parsed)) {
+          galleryUrls.push(...parsed.filter((url) => typeof url === 'string' && url));
+        }
+      } catch {
+        // Ignore malformed input, as the update route does
+      }
+    }
+
+    // Upload gallery images
     for (const gf of galleryFiles) {
       const url = await uploadFile(gf, 'gallery', slug);
       galleryUrls.push(url);
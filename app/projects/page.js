@@ -4,12 +4,16 @@ import { supabase } from '@/lib/supabaseClient';
 import ProjectCard from '@/components/ProjectCard';
 import SectionHeading from '@/components/SectionHeading';
 
+const PAGE_SIZE = 12;
+
 export default function ProjectsPage() {
   const [projects, setProjects] = useState([]);
   const [filteredProjects, setFilteredProjects] = useState([]);
   const [activeCategory, setActiveCategory] = useState('all');
   const [searchQuery, setSearchQuery] = useState('');
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const categories = [
     { value: 'all', label: 'All Projects' },
@@ -21,45 +25,89 @@ export default function ProjectsPage() {
 
   useEffect(() => {
     fetchProjects();
-  }, []);
+  }, [activeCategory]);
 
   useEffect(() => {
-    filterProjects();
-  }, [activeCategory, searchQuery, projects]);
+    if (!searchQuery.trim()) {
+      setFilteredProjects(projects);
+      return;
+    }
+    const timer = setTimeout(() => searchProjects(searchQuery), 200);
+    return () => clearTimeout(timer);
+  }, [searchQuery, projects]);
+
+  // Card fields only, one page at a time, filtered by category on the server.
+  async function fetchPage(cursor) {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE) });
+    if (activeCategory !== 'all') params.set('category', activeCategory);
+    if (cursor) params.set('cursor', cursor);
+    const response = await fetch(`/api/projects?${params}`);
+    if (!response.ok) throw new Error('Failed to load projects');
+    return response.json();
+  }
+
+  // Direct read with the anon key when /api/projects is unavailable, e.g.
+  // `yarn dev` without the backend, or a backend missing its Supabase env.
+  async function fetchAllFromSupabase() {
+    let query = supabase
+      .from('projects')
+      .select('id,slug,name,category,location,year,cover_image_url,is_featured,created_at')
+      .order('created_at', { ascending: false });
+    if (activeCategory !== 'all') query = query.eq('category', activeCategory);
+    const { data, error } = await query;
+    if (error) throw error;
+    return { projects: data || [], next_cursor: null };
+  }
 
   async function fetchProjects() {
     setLoading(true);
     try {
-      const { data } = await supabase
-        .from('projects')
-        .select('*')
-        .order('created_at', { ascending: false });
-
-      if (data) {
-        setProjects(data);
-        setFilteredProjects(data);
+      let data;
+      try {
+        data = await fetchPage(null);
+      } catch (e) {
+        console.error('Falling back to Supabase for projects:', e);
+        data = await fetchAllFromSupabase();
       }
+      setProjects(data.projects);
+      setNextCursor(data.next_cursor);
     } catch (e) {
-      // Supabase may not be configured
+      console.error('Could not load projects:', e);
+      setProjects([]);
+      setNextCursor(null);
     }
     setLoading(false);
   }
 
-  function filterProjects() {
-    let filtered = projects;
-
-    if (activeCategory !== 'all') {
-      filtered = filtered.filter(p => p.category === activeCategory);
+  async function loadMore() {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const data = await fetchPage(nextCursor);
+      setProjects((current) => [...current, ...data.projects]);
+      setNextCursor(data.next_cursor);
+    } catch (e) {
+      // Keep what is already shown
     }
+    setLoadingMore(false);
+  }
 
-    if (searchQuery) {
-      filtered = filtered.filter(p =>
-        p.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-        p.location?.toLowerCase().includes(searchQuery.toLowerCase())
-      );
+  // Ranked search over the whole catalogue, not just the loaded pages.
+  async function searchProjects(query) {
+    const params = new URLSearchParams({ q: query, limit: '50' });
+    if (activeCategory !== 'all') params.set('category', activeCategory);
+    try {
+      const response = await fetch(`/api/projects/search?${params}`);
+      if (!response.ok) throw new Error('Search failed');
+      const data = await response.json();
+      setFilteredProjects(data.results);
+    } catch (e) {
+      // Without the backend, match the loaded cards by name or location.
+      const needle = query.toLowerCase();
+      setFilteredProjects(projects.filter((p) =>
+        p.name.toLowerCase().includes(needle) || p.location?.toLowerCase().includes(needle)
+      ));
     }
-
-    setFilteredProjects(filtered);
   }
 
   return (
@@ -115,6 +163,19 @@ export default function ProjectsPage() {
             ))}
           </div>
         )}
+
+        {!loading && nextCursor && !searchQuery.trim() && (
+          <div className="text-center mt-12">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              data-testid="projects-load-more"
+              className="px-8 py-3 text-xs uppercase tracking-[0.12em] font-bold bg-[#111111] text-[rgba(245,242,234,0.6)] border border-[rgba(198,168,107,0.18)] hover:text-[#F5F2EA] hover:border-[#C6A86B] transition-all duration-300 disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load More'}
+            </button>
+          </div>
+        )}
       </div>
     </main>
   );
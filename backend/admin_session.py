@@ -0,0 +1,144 @@
+"""Signed admin session cookies.
+
+Next.js marks an admin session with ``admin_auth=authenticated``, a value
+anyone can send. The proxy swaps that cookie for a signed, expiring token
+when it relays the login response, and swaps it back when forwarding a
+request whose token verifies. Requests without a valid token reach Next.js
+with no ``admin_auth`` cookie at all, and calls to /api/admin/* are answered
+with 401 before their body is read.
+
+Tokens are ``<expires>.<nonce>.<signature>`` with an HMAC-SHA256 signature
+keyed by ``ADMIN_SESSION_SECRET``, which every proxy instance and the Next.js
+middleware (middleware.js, guarding /admin) must share. Changing it signs
+everyone out. Without it nothing is signed or verified: logins are refused
+and the admin API answers 401. Tokens that verified are kept in a small LRU
+so a busy admin page costs a dict lookup per request.
+"""
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+COOKIE_NAME = "admin_auth"
+LEGACY_VALUE = "authenticated"
+SESSION_MAX_AGE = int(os.environ.get("ADMIN_SESSION_MAX_AGE", str(24 * 3600)))
+SESSION_CACHE_SIZE = int(os.environ.get("ADMIN_SESSION_CACHE_SIZE", "1024"))
+_SECRET = os.environ.get("ADMIN_SESSION_SECRET", "").encode()
+if not _SECRET:
+    logger.warning("ADMIN_SESSION_SECRET is not set; admin logins are disabled")
+# Longest token we will bother to look at: 10-digit expiry, nonce, signature.
+MAX_TOKEN_LENGTH = 96
+
+
+def _signature(secret, payload):
+    digest = hmac.new(secret, payload.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+class SessionSigner:
+    def __init__(self, secret=_SECRET, cache_size=SESSION_CACHE_SIZE):
+        self.secret = secret
+        self.cache_size = cache_size
+        self._verified = OrderedDict()   # token -> expiry
+        self.issued = 0
+        self.cache_hits = 0
+        self.rejected = 0
+        # Admin API calls answered with 401 before reaching Next.js.
+        self.denied = 0
+
+    @property
+    def enabled(self):
+        return bool(self.secret)
+
+    def sign(self, max_age=SESSION_MAX_AGE):
+        if not self.secret:
+            raise RuntimeError("ADMIN_SESSION_SECRET is not set")
+        payload = f"{int(time.time() + max_age)}.{secrets.token_urlsafe(12)}"
+        self.issued += 1
+        return f"{payload}.{_signature(self.secret, payload)}"
+
+    def verify(self, token):
+        if not token or not self.secret:
+            return False
+        expires = self._verified.get(token)
+        if expires is not None:
+            if expires > time.time():
+                self._verified.move_to_end(token)
+                self.cache_hits += 1
+                return True
+            del self._verified[token]
+            return False
+
+        # Cheap shape checks first, so junk never reaches the HMAC.
+        if len(token) > MAX_TOKEN_LENGTH or token.count(".") != 2:
+            self.rejected += 1
+            return False
+        payload, _, signature = token.rpartition(".")
+        expires_text = payload.partition(".")[0]
+        if not expires_text.isdigit() or int(expires_text) <= time.time():
+            self.rejected += 1
+            return False
+        if not hmac.compare_digest(signature, _signature(self.secret, payload)):
+            self.rejected += 1
+            return False
+
+        self._verified[token] = int(expires_text)
+        if len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+        return True
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "issued": self.issued,
+            "cached": len(self._verified),
+            "cache_hits": self.cache_hits,
+            "rejected": self.rejected,
+            "denied": self.denied,
+        }
+
+
+sessions = SessionSigner()
+
+
+def upstream_cookie_header(header):
+    """The Cookie header to send to Next.js.
+
+    A verified token becomes ``admin_auth=authenticated``; any other
+    ``admin_auth`` value is dropped.
+    """
+    if not header or COOKIE_NAME not in header:
+        return header
+    parts = []
+    for part in header.split(";"):
+        name, _, value = part.strip().partition("=")
+        if name != COOKIE_NAME:
+            parts.append(part.strip())
+        elif sessions.verify(value):
+            parts.append(f"{COOKIE_NAME}={LEGACY_VALUE}")
+    return "; ".join(p for p in parts if p)
+
+
+def sign_set_cookie(header):
+    """Replace the value of an ``admin_auth=authenticated`` Set-Cookie with a token.
+
+    The token lives as long as the cookie's Max-Age; other cookies (and the
+    logout cookie, which has an empty value) pass through unchanged.
+    """
+    cookie, _, attributes = header.partition(";")
+    name, _, value = cookie.strip().partition("=")
+    if name != COOKIE_NAME or value != LEGACY_VALUE:
+        return header
+    max_age = SESSION_MAX_AGE
+    for attribute in attributes.split(";"):
+        key, _, number = attribute.strip().partition("=")
+        if key.lower() == "max-age" and number.isdigit():
+            max_age = int(number)
+    token = sessions.sign(max_age)
+    return f"{COOKIE_NAME}={token}" + (f";{attributes}" if attributes else "")
@@ -0,0 +1,229 @@
+"""Admission control in front of the proxy.
+
+Two layers, both answering before any upstream work is done:
+
+* per-client token buckets, with a much smaller budget for /api/admin/*
+  (uploads and logins) than for public pages, answered with 429;
+* a global concurrency limit with a bounded FIFO wait queue. A request that
+  finds the queue full, or waits longer than the queue deadline, gets 503.
+
+Both carry ``Retry-After``, so a single Next.js process sees a bounded amount
+of work and admitted requests keep a bounded latency under bursts.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from starlette.responses import JSONResponse
+
+ADMISSION_ENABLED = os.environ.get("PROXY_ADMISSION_ENABLED", "true").lower() == "true"
+MAX_CONCURRENT = int(os.environ.get("PROXY_MAX_CONCURRENT", "64"))
+MAX_QUEUE = int(os.environ.get("PROXY_MAX_QUEUE", "256"))
+QUEUE_TIMEOUT = float(os.environ.get("PROXY_QUEUE_TIMEOUT", "5"))
+RATE_LIMIT_RPS = float(os.environ.get("PROXY_RATE_LIMIT_RPS", "50"))
+RATE_LIMIT_BURST = float(os.environ.get("PROXY_RATE_LIMIT_BURST", "100"))
+ADMIN_RATE_LIMIT_RPS = float(os.environ.get("PROXY_ADMIN_RATE_LIMIT_RPS", "2"))
+ADMIN_RATE_LIMIT_BURST = float(os.environ.get("PROXY_ADMIN_RATE_LIMIT_BURST", "10"))
+# Bounded so a spray of spoofed client addresses cannot grow memory.
+MAX_TRACKED_CLIENTS = int(os.environ.get("PROXY_RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Proxies in front of this one that append to X-Forwarded-For. Everything to
+# the left of the hop they added is whatever the client sent.
+TRUSTED_HOPS = int(os.environ.get("PROXY_TRUSTED_HOPS", "1"))
+
+# Cheap local endpoints that must stay reachable while the proxy is saturated.
+EXEMPT_PREFIXES = ("/metrics", "/api/proxy/", "/_next/static/", "/favicon.ico")
+RESUMABLE_CHUNK_PREFIX = "/api/admin/upload/resumable/"
+
+
+class Rejected(Exception):
+    def __init__(self, status_code, message, retry_after):
+        self.status_code = status_code
+        self.message = message
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, rate, burst):
+        """Take one token; returns 0 on success or seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / rate
+
+
+class RateLimiter:
+    def __init__(self, rate, burst, max_clients=MAX_TRACKED_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self.limited = 0
+
+    def check(self, client):
+        if self.rate <= 0:
+            return
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.burst)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        wait = bucket.take(self.rate, self.burst)
+        if wait:
+            self.limited += 1
+            raise Rejected(429, "Too many requests", wait)
+
+    def stats(self):
+        return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets), "limited": self.limited}
+
+
+class ConcurrencyLimiter:
+    """A semaphore with a bounded FIFO queue and a per-request queue deadline."""
+
+    def __init__(self, limit=MAX_CONCURRENT, max_queue=MAX_QUEUE, queue_timeout=QUEUE_TIMEOUT):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    async def acquire(self):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_full += 1
+            raise Rejected(503, "Server is busy, please retry", self.queue_timeout)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.rejected_timeout += 1
+            raise Rejected(503, "Server is busy, please retry", self.queue_timeout)
+        except asyncio.CancelledError:
+            # The client went away; hand on a slot we may have been given.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        self.admitted += 1
+
+    def release(self):
+        # Hand the slot straight to the oldest live waiter so it cannot be
+        # taken by a newcomer in between.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _discard(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_queue_timeout": self.rejected_timeout,
+        }
+
+
+def client_id(scope, trusted_hops=TRUSTED_HOPS):
+    """The X-Forwarded-For hop added by the outermost trusted proxy, else the peer address."""
+    hops = []
+    for name, value in scope.get("headers", ()):
+        if name == b"x-forwarded-for":
+            hops.extend(filter(None, (hop.strip() for hop in value.split(b","))))
+    if trusted_hops > 0 and hops:
+        return hops[max(0, len(hops) - trusted_hops)].decode("latin-1")
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class AdmissionController:
+    def __init__(self):
+        self.concurrency = ConcurrencyLimiter()
+        self.public_rate = RateLimiter(RATE_LIMIT_RPS, RATE_LIMIT_BURST)
+        self.admin_rate = RateLimiter(ADMIN_RATE_LIMIT_RPS, ADMIN_RATE_LIMIT_BURST)
+
+    def stats(self):
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "concurrency": self.concurrency.stats(),
+            "rate_limit": {"public": self.public_rate.stats(), "admin": self.admin_rate.stats()},
+        }
+
+
+admission = AdmissionController()
+
+
+def _admin_limited(path):
+    # Resumable uploads send one request per chunk; they are bounded by the
+    # bytes they carry rather than by the admin request budget.
+    return path.startswith("/api/admin/") and not path.startswith(RESUMABLE_CHUNK_PREFIX)
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware; the slot is held until the response body is sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if not ADMISSION_ENABLED or scope["type"] != "http" or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            limiter = admission.admin_rate if _admin_limited(path) else admission.public_rate
+            limiter.check(client_id(scope))
+            started = time.perf_counter()
+            await admission.concurrency.acquire()
+            # Reported as the "queue" phase in Server-Timing.
+            scope.setdefault("state", {})["queue_seconds"] = time.perf_counter() - started
+        except Rejected as exc:
+            response = JSONResponse(
+                {"error": exc.message},
+                status_code=exc.status_code,
+                headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.concurrency.release()
@@ -0,0 +1,189 @@
+"""In-memory response cache for public pages served through the proxy.
+
+Entries are kept in LRU order with a TTL and a total byte budget. Public
+pages only change when an admin creates, updates or deletes a project, so
+those mutations invalidate the affected entries directly.
+"""
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+CACHE_ENABLED = os.environ.get("PROXY_CACHE_ENABLED", "true").lower() == "true"
+CACHE_TTL = float(os.environ.get("PROXY_CACHE_TTL", "300"))
+CACHE_MAX_BYTES = int(os.environ.get("PROXY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_ENTRY_BYTES = int(os.environ.get("PROXY_CACHE_MAX_ENTRY_BYTES", str(2 * 1024 * 1024)))
+
+# Pages that only change through the admin project routes.
+CACHEABLE_PATHS = [
+    re.compile(r"^/$"),
+    re.compile(r"^/about$"),
+    re.compile(r"^/projects$"),
+    re.compile(r"^/projects/[^/]+$"),
+]
+
+# Request headers that change what Next.js renders for the same URL
+# (client-side navigations ask for the RSC payload instead of HTML).
+VARY_HEADERS = ("rsc", "next-router-state-tree", "next-router-prefetch", "next-url")
+
+MUTATION_PATHS = {
+    "/api/admin/projects/create",
+    "/api/admin/projects/update",
+    "/api/admin/projects/delete",
+}
+
+# Pages that list projects and so change on every mutation.
+LISTING_PATHS = ("/", "/projects")
+
+
+@dataclass
+class CacheEntry:
+    path: str
+    status_code: int
+    headers: dict
+    body: bytes
+    expires_at: float
+    size: int = field(init=False)
+
+    def __post_init__(self):
+        self.size = len(self.body) + sum(len(k) + len(v) for k, v in self.headers.items())
+
+
+class ResponseCache:
+    def __init__(self, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, max_entry_bytes=CACHE_MAX_ENTRY_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # project id -> slug, so a delete (which only carries the id) can
+        # find the page it affects.
+        self._slugs = {}
+        # Other per-path state (e.g. the ETag index) dropped alongside entries.
+        self._listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def is_cacheable_request(method, path, headers):
+        if not CACHE_ENABLED or method not in ("GET", "HEAD"):
+            return False
+        if "authorization" in headers:
+            return False
+        return any(pattern.match(path) for pattern in CACHEABLE_PATHS)
+
+    @staticmethod
+    def key_for(path, query, headers):
+        vary = tuple(headers.get(name, "") for name in VARY_HEADERS)
+        return (path, query, vary)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            # Kept until evicted so it can still be served stale.
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get_stale(self, key):
+        """Return an entry even if it has expired; used when upstreams fail fast."""
+        return self._entries.get(key)
+
+    @staticmethod
+    def is_storable(status_code, headers):
+        return status_code == 200 and not any(k.lower() == "set-cookie" for k in headers)
+
+    def store(self, key, path, status_code, headers, body):
+        """Cache a successful response; returns True if it was stored."""
+        if not self.is_storable(status_code, headers):
+            return False
+        entry = CacheEntry(path, status_code, headers, body, time.monotonic() + self.ttl)
+        if entry.size > self.max_entry_bytes:
+            return False
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return True
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def add_listener(self, listener):
+        """Register an object with invalidate_path/invalidate_prefix methods."""
+        self._listeners.append(listener)
+
+    def invalidate_path(self, path):
+        for key in [k for k, e in self._entries.items() if e.path == path]:
+            self._remove(key)
+        for listener in self._listeners:
+            listener.invalidate_path(path)
+
+    def invalidate_prefix(self, prefix):
+        for key in [k for k, e in self._entries.items() if e.path.startswith(prefix)]:
+            self._remove(key)
+        for listener in self._listeners:
+            listener.invalidate_prefix(prefix)
+
+    def remember_project(self, project):
+        if project and project.get("id") is not None and project.get("slug"):
+            self._slugs[str(project["id"])] = project["slug"]
+
+    def invalidate_for_mutation(self, path, query_params, payload):
+        """Drop every page affected by a successful admin project mutation.
+
+        ``payload`` is the decoded JSON reply from Next.js; create and update
+        return the project so its slug is known, delete only gets an id.
+        """
+        for listing in LISTING_PATHS:
+            self.invalidate_path(listing)
+
+        project = payload.get("project") if isinstance(payload, dict) else None
+        project_id = None
+        if isinstance(project, dict) and project.get("id") is not None:
+            project_id = str(project["id"])
+        elif query_params.get("id"):
+            project_id = query_params["id"]
+
+        old_slug = self._slugs.get(project_id) if project_id else None
+        new_slug = project.get("slug") if isinstance(project, dict) else None
+
+        if path.endswith("/delete"):
+            self._slugs.pop(project_id, None)
+        elif isinstance(project, dict):
+            self.remember_project(project)
+
+        if path.endswith("/create") and new_slug:
+            self.invalidate_path(f"/projects/{new_slug}")
+            return
+        if old_slug is None:
+            # Unknown project: any detail page may be stale.
+            self.invalidate_prefix("/projects/")
+            return
+        self.invalidate_path(f"/projects/{old_slug}")
+        if new_slug and new_slug != old_slug:
+            self.invalidate_path(f"/projects/{new_slug}")
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,184 @@
+"""Sampled traffic capture for capacity planning.
+
+Off unless ``PROXY_CAPTURE_SAMPLE_RATE`` is above zero (it can also be
+switched on at runtime through /api/proxy/capture). For a sampled request
+the middleware records the method, normalised route, status, request and
+response sizes, total duration and upstream latency; no paths beyond the
+route pattern, query strings, headers or bodies are kept. Records go onto a
+bounded queue and a background task appends them to the log in batches, off
+the event loop, so a request never waits on the disk. When the queue is
+full, or the log has reached its size cap, records are dropped and counted.
+
+The log is tab-separated text, one request per line, after a ``#`` header
+naming the fields; backend_replay.py replays it.
+"""
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import metrics
+
+CAPTURE_PATH = os.environ.get("PROXY_CAPTURE_PATH", os.path.join(tempfile.gettempdir(), "invera-traffic.tsv"))
+CAPTURE_SAMPLE_RATE = float(os.environ.get("PROXY_CAPTURE_SAMPLE_RATE", "0"))
+CAPTURE_QUEUE_SIZE = int(os.environ.get("PROXY_CAPTURE_QUEUE_SIZE", "10000"))
+CAPTURE_MAX_BYTES = int(os.environ.get("PROXY_CAPTURE_MAX_BYTES", str(256 * 1024 * 1024)))
+CAPTURE_BATCH = 500
+
+FIELDS = ("ts_ms", "method", "route", "status", "request_bytes", "response_bytes", "duration_ms", "upstream_ms")
+HEADER = "# invera-capture v1\t" + "\t".join(FIELDS) + "\n"
+# Operator traffic is not part of the mix being measured.
+SKIPPED_PREFIXES = ("/metrics", "/api/proxy/")
+
+
+def format_record(record):
+    return "\t".join("-" if value is None else str(value) for value in record) + "\n"
+
+
+def parse_line(line):
+    """Return a dict for one log line, or None for the header and blank lines."""
+    if not line.strip() or line.startswith("#"):
+        return None
+    values = line.rstrip("\n").split("\t")
+    record = dict(zip(FIELDS, values))
+    for field in ("ts_ms", "status", "request_bytes", "response_bytes"):
+        record[field] = int(record[field])
+    for field in ("duration_ms", "upstream_ms"):
+        record[field] = None if record[field] == "-" else float(record[field])
+    return record
+
+
+class TrafficCapture:
+    def __init__(self, path=CAPTURE_PATH, sample_rate=CAPTURE_SAMPLE_RATE,
+                 queue_size=CAPTURE_QUEUE_SIZE, max_bytes=CAPTURE_MAX_BYTES):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self._queue = asyncio.Queue(queue_size)
+        self._writer = None
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+
+    async def start(self):
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def close(self):
+        if self._writer is not None:
+            # Let queued records reach the disk before stopping.
+            await self._queue.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+
+    def configure(self, sample_rate=None):
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    def sampled(self, path):
+        return self.sample_rate > 0 and random.random() < self.sample_rate and not path.startswith(SKIPPED_PREFIXES)
+
+    def record(self, record):
+        try:
+            self._queue.put_nowait(record)
+            self.captured += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _write_loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < CAPTURE_BATCH and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._append, batch)
+            except OSError:
+                self.dropped += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _append(self, batch):
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            size = 0
+        if size >= self.max_bytes:
+            self.dropped += len(batch)
+            return
+        with open(self.path, "a") as f:
+            if size == 0:
+                f.write(HEADER)
+            f.write("".join(format_record(record) for record in batch))
+        self.written += len(batch)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "sample_rate": self.sample_rate,
+            "max_bytes": self.max_bytes,
+            "queued": self._queue.qsize(),
+            "captured": self.captured,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+capture = TrafficCapture()
+
+
+class CaptureMiddleware:
+    """Pure ASGI middleware; requests that are not sampled pass straight through."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not capture.sampled(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        counts = {"in": 0, "out": 0, "status": 500}
+        # Rejected requests may never read their body; the declared size is
+        # what a replay has to send.
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length" and value.isdigit():
+                counts["in"] = int(value)
+        received = 0
+        started = time.perf_counter()
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                counts["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                counts["out"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            upstream = state.get("upstream_seconds")
+            capture.record((
+                int(time.time() * 1000),
+                scope["method"],
+                metrics.normalize_route(scope["path"]),
+                counts["status"],
+                max(counts["in"], received),
+                counts["out"],
+                round((time.perf_counter() - started) * 1000, 2),
+                None if upstream is None else round(upstream * 1000, 2),
+            ))
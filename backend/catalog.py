@@ -0,0 +1,160 @@
+"""In-memory project catalogue behind the paginated listing API.
+
+Holds only the fields a project card needs, newest first, loaded from
+PostgREST on first use. Admin mutations patch it from the project returned
+by the Next.js route, so it does not need a reload to stay current; a TTL
+reload catches changes made outside the admin UI. Listeners (the search
+index) are given the same full rows and updates.
+"""
+import base64
+import binascii
+import json
+import logging
+import os
+import time
+
+import httpx
+
+from singleflight import SingleFlight
+from supabase_rest import RestError, rest
+
+logger = logging.getLogger(__name__)
+
+CATALOG_TTL = float(os.environ.get("PROJECT_CATALOG_TTL", "300"))
+PAGE_SIZE = int(os.environ.get("PROJECT_LIST_PAGE_SIZE", "12"))
+MAX_PAGE_SIZE = int(os.environ.get("PROJECT_LIST_MAX_PAGE_SIZE", "50"))
+
+# What ProjectCard renders, plus what ordering and filtering need.
+CARD_FIELDS = ("id", "slug", "name", "category", "location", "year", "cover_image_url", "is_featured", "created_at")
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+def _sort_key(project):
+    return (project.get("created_at") or "", str(project.get("id")))
+
+
+def encode_cursor(project):
+    raw = json.dumps(_sort_key(project), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, project_id = json.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidQuery("Invalid cursor")
+    return (str(created_at), str(project_id))
+
+
+def parse_fields(fields):
+    if not fields:
+        return CARD_FIELDS
+    names = tuple(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [name for name in names if name not in CARD_FIELDS]
+    if unknown:
+        raise InvalidQuery(f"Unknown field(s): {', '.join(unknown)}")
+    return names
+
+
+class ProjectCatalog:
+    def __init__(self, ttl=CATALOG_TTL):
+        self.ttl = ttl
+        self._projects = {}   # id -> card fields
+        self._ordered = []    # newest first
+        self._loaded_at = None
+        self._loads = SingleFlight()
+        self._listeners = []
+        self.reloads = 0
+
+    def add_listener(self, listener):
+        """Register an index with ``fields``, ``sync(rows)``, ``upsert(project)``
+        and ``remove(id)``; its fields are loaded alongside the card fields."""
+        self._listeners.append(listener)
+
+    async def ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            await self._loads.do("load", self._load)
+
+    async def _load(self):
+        columns = dict.fromkeys(CARD_FIELDS)
+        for listener in self._listeners:
+            columns.update(dict.fromkeys(listener.fields))
+        try:
+            rows = await rest.select("projects", ",".join(columns), order="created_at.desc")
+        except (RestError, httpx.HTTPError) as exc:
+            # Callers answer 502 and the projects page shows nothing; say why.
+            logger.error("Loading projects from %s failed: %s", rest.url, exc)
+            raise
+        self._projects = {str(row["id"]): {f: row.get(f) for f in CARD_FIELDS} for row in rows}
+        self._reorder()
+        self._loaded_at = time.monotonic()
+        self.reloads += 1
+        for listener in self._listeners:
+            listener.sync(rows)
+
+    def _reorder(self):
+        self._ordered = sorted(self._projects.values(), key=_sort_key, reverse=True)
+
+    def upsert(self, project):
+        card = {field: project.get(field) for field in CARD_FIELDS}
+        self._projects[str(card["id"])] = card
+        self._reorder()
+        for listener in self._listeners:
+            listener.upsert(project)
+
+    def remove(self, project_id):
+        if self._projects.pop(str(project_id), None) is not None:
+            self._reorder()
+        for listener in self._listeners:
+            listener.remove(str(project_id))
+
+    def apply_mutation(self, path, query_params, payload):
+        """Patch the catalogue after a successful admin project mutation."""
+        if self._loaded_at is None:
+            return
+        project = payload.get("project") if isinstance(payload, dict) else None
+        if path.endswith("/delete"):
+            if query_params.get("id"):
+                self.remove(query_params["id"])
+        elif isinstance(project, dict) and project.get("id") is not None:
+            self.upsert(project)
+        else:
+            # Unexpected reply: reload on next use.
+            self._loaded_at = None
+
+    def get(self, project_id):
+        return self._projects.get(str(project_id))
+
+    def page(self, category=None, featured=None, cursor=None, limit=PAGE_SIZE, fields=CARD_FIELDS):
+        """Return ``(items, next_cursor, total)`` for one page of cards."""
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise InvalidQuery(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+        after = decode_cursor(cursor) if cursor else None
+        matches = [
+            p for p in self._ordered
+            if (category is None or p.get("category") == category)
+            and (featured is None or bool(p.get("is_featured")) == featured)
+        ]
+        start = 0
+        if after is not None:
+            # Rows are newest first, so the next page starts at the first
+            # row that sorts strictly below the cursor.
+            start = next((i for i, p in enumerate(matches) if _sort_key(p) < after), len(matches))
+        items = matches[start:start + limit]
+        next_cursor = encode_cursor(items[-1]) if start + limit < len(matches) else None
+        return [{f: p.get(f) for f in fields} for p in items], next_cursor, len(matches)
+
+    def stats(self):
+        return {
+            "projects": len(self._projects),
+            "loaded": self._loaded_at is not None,
+            "age_s": None if self._loaded_at is None else round(time.monotonic() - self._loaded_at, 1),
+            "reloads": self.reloads,
+        }
+
+
+catalog = ProjectCatalog()
@@ -0,0 +1,144 @@
+"""Negotiated gzip/brotli compression for buffered proxy responses.
+
+Compressed bodies are cached by content hash, so a hot page served from the
+response cache is compressed once per encoding rather than on every request.
+"""
+import asyncio
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get("PROXY_COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_BYTES = int(os.environ.get("PROXY_COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_CACHE_BYTES = int(os.environ.get("PROXY_COMPRESSION_CACHE_BYTES", str(16 * 1024 * 1024)))
+GZIP_LEVEL = int(os.environ.get("PROXY_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("PROXY_BROTLI_QUALITY", "5"))
+
+# Bodies larger than this are compressed in a worker thread.
+OFFLOAD_BYTES = 256 * 1024
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "application/manifest+json",
+    "image/svg+xml",
+)
+
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding):
+    """Pick the best supported encoding from an Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    best = None
+    for encoding in SUPPORTED_ENCODINGS:
+        q = accepted.get(encoding, wildcard)
+        if q > 0 and (best is None or q > best[1]):
+            best = (encoding, q)
+    return best[0] if best else None
+
+
+def is_compressible(headers, body):
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return False
+    lowered = {k.lower(): v for k, v in headers.items()}
+    if "content-encoding" in lowered:
+        return False
+    content_type = lowered.get("content-type", "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressedBodyCache:
+    def __init__(self, max_bytes=COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def compress(self, body, encoding):
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        compressed = self._entries.get(key)
+        if compressed is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return compressed
+        self.misses += 1
+        if len(body) > OFFLOAD_BYTES:
+            compressed = await asyncio.to_thread(_compress, body, encoding)
+        else:
+            compressed = _compress(body, encoding)
+        if len(compressed) <= self.max_bytes:
+            self._entries[key] = compressed
+            self._bytes += len(compressed)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+        return compressed
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "encodings": list(SUPPORTED_ENCODINGS),
+        }
+
+
+compressed_bodies = CompressedBodyCache()
+
+
+async def maybe_compress(accept_encoding, headers, body):
+    """Return ``(headers, body)``, compressed if the client and content allow."""
+    if not COMPRESSION_ENABLED or not is_compressible(headers, body):
+        return headers, body
+    headers = {**headers, "vary": _add_vary(headers.get("vary"), "Accept-Encoding")}
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return headers, body
+    compressed = await compressed_bodies.compress(body, encoding)
+    if len(compressed) >= len(body):
+        return headers, body
+    headers = {**headers, "content-encoding": encoding}
+    etag = headers.get("etag")
+    if etag and etag.endswith('"') and not etag.startswith("W/"):
+        # A strong ETag names exact bytes, so each encoding gets its own.
+        headers["etag"] = f'{etag[:-1]}-{encoding}"'
+    return headers, compressed
+
+
+def _add_vary(existing, name):
+    if not existing:
+        return name
+    if name.lower() in (v.strip().lower() for v in existing.split(",")):
+        return existing
+    return f"{existing}, {name}"
@@ -0,0 +1,117 @@
+"""Content-addressed deduplication of project image uploads.
+
+Admins re-upload the same photos when they edit a project. Each upload is
+hashed (SHA-256) as it is read and looked up in a local digest -> URL index;
+if the same bytes were already stored for that project the existing URL is
+returned and nothing is sent to storage.
+
+Entries are scoped to the upload folder and the project's id. The Next.js
+routes delete a project's objects on update and delete, so an object shared
+between projects (or between a cover and a gallery) could be removed from
+under the other one. The slug is not enough: the client sends one derived
+from the name, and a create may rename it when it is taken, so two projects
+could share it. Uploads for a project that has no id yet (a create) are not
+deduplicated. Before a URL is reused the object is checked with a HEAD
+request, so entries whose object has since been deleted are dropped and
+re-uploaded.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+
+from singleflight import SingleFlight
+from storage import storage
+
+DEDUP_ENABLED = os.environ.get("UPLOAD_DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_MAX_ENTRIES = int(os.environ.get("UPLOAD_DEDUP_MAX_ENTRIES", "10000"))
+HASH_CHUNK = 256 * 1024
+
+
+def new_hasher():
+    return hashlib.sha256()
+
+
+async def hash_upload_file(file, head_size=16):
+    """SHA-256 hex digest and first ``head_size`` bytes of a Starlette ``UploadFile``.
+
+    One pass in chunks, so validating the file type costs no extra read.
+    """
+    hasher = new_hasher()
+    head = b""
+    await file.seek(0)
+    while True:
+        chunk = await file.read(HASH_CHUNK)
+        if not chunk:
+            break
+        if len(head) < head_size:
+            head += chunk[:head_size - len(head)]
+        hasher.update(chunk)
+    await file.seek(0)
+    return hasher.hexdigest(), head
+
+
+async def iter_upload_file(file):
+    """The body of an ``UploadFile`` in chunks, for streaming to storage."""
+    await file.seek(0)
+    while True:
+        chunk = await file.read(HASH_CHUNK)
+        if not chunk:
+            return
+        yield chunk
+
+
+class ContentIndex:
+    def __init__(self, enabled=DEDUP_ENABLED, max_entries=DEDUP_MAX_ENTRIES):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self._urls = OrderedDict()   # (folder, project id, digest) -> public URL
+        self._stores = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.bytes_saved = 0
+
+    async def store(self, folder, project_id, digest, size, upload):
+        """Return the URL for this content, calling ``upload()`` only if it is new.
+
+        Identical files uploaded at the same time share a single upload.
+        Without a ``project_id`` the file is always uploaded.
+        """
+        if not self.enabled or not project_id:
+            return await upload()
+        key = (folder, str(project_id), digest)
+        return await self._stores.do(key, lambda: self._store(key, size, upload))
+
+    async def _store(self, key, size, upload):
+        url = self._urls.get(key)
+        if url is not None:
+            if await storage.exists(storage.path_from_url(url)):
+                self._urls.move_to_end(key)
+                self.hits += 1
+                self.bytes_saved += size
+                return url
+            del self._urls[key]
+            self.stale += 1
+        self.misses += 1
+        url = await upload()
+        self.remember(key, url)
+        return url
+
+    def remember(self, key, url):
+        self._urls[key] = url
+        self._urls.move_to_end(key)
+        while len(self._urls) > self.max_entries:
+            self._urls.popitem(last=False)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._urls),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+content_index = ContentIndex()
@@ -0,0 +1,91 @@
+"""Content-addressed on-disk cache with LRU eviction by total bytes."""
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+
+
+class DiskCache:
+    """Files are named by the SHA-256 of their key and sharded by prefix.
+
+    The LRU order lives in memory and is rebuilt from file mtimes on start;
+    a hit bumps the mtime so the order survives restarts.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._files = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self):
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.startswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((st.st_mtime, path, st.st_size))
+        self._files.clear()
+        self._bytes = 0
+        for _, path, size in sorted(found):
+            self._files[path] = size
+            self._bytes += size
+        self._evict()
+
+    def path_for(self, key, suffix=""):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest + suffix)
+
+    def get(self, path):
+        if path not in self._files or not os.path.exists(path):
+            self._files.pop(path, None)
+            self.misses += 1
+            return None
+        self._files.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return path
+
+    def put(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._bytes -= self._files.pop(path, 0)
+        self._files[path] = len(data)
+        self._bytes += len(data)
+        self._evict()
+        return path
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._files:
+            path, size = self._files.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return {
+            "files": len(self._files),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,128 @@
+"""Strong ETags and conditional GET handling for cached pages.
+
+ETags are a blake2b digest of the identity body. The ETag index remembers
+the validator for each cache key independently of the (much larger) cached
+body, so a revalidation can be answered with 304 without contacting Next.js
+even after the body itself has been evicted. Entries share the page cache
+TTL and are dropped by the same mutation invalidation.
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from cache import CACHE_TTL, response_cache
+
+ETAGS_ENABLED = os.environ.get("PROXY_ETAGS_ENABLED", "true").lower() == "true"
+ETAG_INDEX_MAX_ENTRIES = int(os.environ.get("PROXY_ETAG_INDEX_MAX_ENTRIES", "10000"))
+
+# Headers a 304 must repeat from the 200 it stands in for.
+NOT_MODIFIED_HEADERS = ("cache-control", "content-location", "date", "etag", "expires", "vary", "last-modified")
+
+
+def strong_etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _opaque(tag):
+    """Compare validators ignoring weakness and the per-encoding suffix."""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ("-br\"", "-gzip\""):
+        if tag.endswith(suffix):
+            return tag[: -len(suffix)] + '"'
+    return tag
+
+
+def is_not_modified(request_headers, etag, last_modified=None):
+    """RFC 9110 evaluation: If-None-Match wins over If-Modified-Since."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        wanted = _opaque(etag)
+        return any(_opaque(tag) == wanted for tag in if_none_match.split(","))
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_headers(headers):
+    return {k: v for k, v in headers.items() if k.lower() in NOT_MODIFIED_HEADERS}
+
+
+class ETagIndex:
+    def __init__(self, ttl=CACHE_TTL, max_entries=ETAG_INDEX_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (path, headers for a 304, expires_at)
+        self._entries = OrderedDict()
+        self.not_modified = 0
+
+    def remember(self, key, path, headers):
+        self._entries[key] = (path, not_modified_headers(headers), time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the 304 headers for a fresh entry, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def invalidate_path(self, path):
+        for key in [k for k, e in self._entries.items() if e[0] == path]:
+            del self._entries[key]
+
+    def invalidate_prefix(self, prefix):
+        for key in [k for k, e in self._entries.items() if e[0].startswith(prefix)]:
+            del self._entries[key]
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "not_modified": self.not_modified,
+        }
+
+
+def tag_response(headers, body, previous=None):
+    """Add a strong ETag and a Last-Modified to a 200 body's headers.
+
+    Last-Modified is carried over from ``previous`` while the ETag is
+    unchanged, so re-rendering an identical page does not reset it.
+    """
+    etag = strong_etag(body)
+    headers = {k: v for k, v in headers.items() if k.lower() not in ("etag", "last-modified")}
+    headers["etag"] = etag
+    if previous is not None and previous.get("etag") == etag and previous.get("last-modified"):
+        headers["last-modified"] = previous["last-modified"]
+    else:
+        headers["last-modified"] = formatdate(time.time(), usegmt=True)
+    return headers
+
+
+def last_modified_timestamp(headers):
+    value = headers.get("last-modified")
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+etag_index = ETagIndex()
+response_cache.add_listener(etag_index)
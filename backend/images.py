@@ -0,0 +1,274 @@
+"""Resized image variants for project photos.
+
+After a project is created or updated, its cover and gallery URLs are queued
+here. Workers download each original, encode thumbnail/card/full variants in
+WebP (and AVIF when Pillow supports it) in a process pool, and upload them
+next to the original in storage. The admin request never waits on this.
+
+Other ``srcset`` widths, from a fixed list, are rendered on demand by
+``OnDemandResizer`` and kept in a bounded on-disk cache.
+"""
+import asyncio
+import io
+import logging
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps, features
+
+from disk_cache import DiskCache
+from singleflight import SingleFlight
+from storage import storage
+
+logger = logging.getLogger(__name__)
+
+# Target widths; images are never upscaled.
+VARIANT_WIDTHS = {"thumb": 400, "card": 800, "full": 1920}
+VARIANT_FORMATS = ("webp", "avif") if features.check("avif") else ("webp",)
+VARIANT_QUALITY = {"webp": 82, "avif": 60}
+CONTENT_TYPES = {"webp": "image/webp", "avif": "image/avif", "jpeg": "image/jpeg", "png": "image/png"}
+
+PIPELINE_WORKERS = int(os.environ.get("IMAGE_PIPELINE_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+PIPELINE_QUEUE_SIZE = int(os.environ.get("IMAGE_PIPELINE_QUEUE_SIZE", "200"))
+PIPELINE_MAX_ATTEMPTS = int(os.environ.get("IMAGE_PIPELINE_MAX_ATTEMPTS", "3"))
+PIPELINE_RETRY_DELAY = float(os.environ.get("IMAGE_PIPELINE_RETRY_DELAY", "2"))
+PIPELINE_HISTORY = 500
+
+RESIZE_WORKERS = int(os.environ.get("IMAGE_RESIZE_WORKERS", "2"))
+RESIZE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "invera-image-cache"))
+RESIZE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Only these renditions are served, so the cache cannot be filled with
+# one-pixel steps. Widths follow the Next.js image sizes, plus the variants.
+RESIZE_WIDTHS = (16, 32, 48, 64, 96, 128, 256, 384, 400, 640, 750, 800, 828, 1080, 1200, 1920, 2048)
+RESIZE_QUALITIES = (50, 60, 75, 82, 90)
+RESIZE_FORMATS = set(VARIANT_FORMATS) | {"jpeg", "png"}
+
+
+def variant_path(original_path, variant, fmt):
+    """covers/slug/123-photo.jpg -> covers/slug/123-photo.card.webp"""
+    stem, _, _ = original_path.rpartition(".")
+    return f"{stem or original_path}.{variant}.{fmt}"
+
+
+def open_image(data):
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    return image
+
+
+def encode(image, width, fmt, quality):
+    if image.width > width:
+        height = round(image.height * width / image.width)
+        image = image.resize((width, height), Image.LANCZOS)
+    out = io.BytesIO()
+    if fmt == "jpeg" and image.mode == "RGBA":
+        image = image.convert("RGB")
+    image.save(out, format=fmt.upper(), quality=quality)
+    return out.getvalue()
+
+
+def render_variants(data, widths=VARIANT_WIDTHS, formats=VARIANT_FORMATS):
+    """Encode every variant of one image. Runs inside a worker process."""
+    image = open_image(data)
+    return [
+        (variant, fmt, encode(image, width, fmt, VARIANT_QUALITY[fmt]))
+        for variant, width in widths.items()
+        for fmt in formats
+    ]
+
+
+def resize_image(data, width, fmt, quality):
+    """Encode one resized copy of an image. Runs inside a worker process."""
+    return encode(open_image(data), width, fmt, quality)
+
+
+class ImageJob:
+    def __init__(self, url):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.state = "queued"
+        self.attempts = 0
+        self.error = None
+        self.variants = {}
+        self.queued_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "url": self.url,
+            "state": self.state,
+            "attempts": self.attempts,
+            "error": self.error,
+            "variants": self.variants,
+            "queued_at": self.queued_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ImagePipeline:
+    def __init__(self, workers=PIPELINE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, max_attempts=PIPELINE_MAX_ATTEMPTS):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self.executor = None
+        self.queue = None
+        self._tasks = []
+        self.jobs = OrderedDict()
+        # Originals already processed (or queued), so an update that keeps
+        # old gallery images does not re-encode them. Oldest first, bounded
+        # like ``jobs``; a forgotten URL only costs one more encode.
+        self._seen = OrderedDict()
+        self.rejected = 0
+
+    async def start(self):
+        if self.executor is not None:
+            return
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def enqueue(self, url):
+        """Queue an original for processing; returns the job, or None if skipped."""
+        if self.queue is None or url in self._seen or storage.path_from_url(url) is None:
+            return None
+        job = ImageJob(url)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            job.state = "rejected"
+            job.error = "queue full"
+        else:
+            self._seen[url] = None
+            while len(self._seen) > PIPELINE_HISTORY:
+                self._seen.popitem(last=False)
+        self._remember(job)
+        return job
+
+    def enqueue_project(self, project):
+        urls = [project.get("cover_image_url")]
+        gallery = project.get("gallery")
+        if isinstance(gallery, list):
+            urls.extend(gallery)
+        return [job for job in map(self.enqueue, filter(None, urls)) if job is not None]
+
+    def _remember(self, job):
+        self.jobs[job.id] = job
+        while len(self.jobs) > PIPELINE_HISTORY:
+            self.jobs.popitem(last=False)
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._process(loop, job)
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, loop, job):
+        job.state = "processing"
+        original_path = storage.path_from_url(job.url)
+        while True:
+            job.attempts += 1
+            try:
+                # Never the URL itself: it came from a form field.
+                data = await storage.download(storage.public_url(original_path))
+                rendered = await loop.run_in_executor(self.executor, render_variants, data)
+                for variant, fmt, body in rendered:
+                    path = variant_path(original_path, variant, fmt)
+                    url = await storage.upload(path, body, CONTENT_TYPES[fmt], upsert=True)
+                    job.variants.setdefault(variant, {})[fmt] = url
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                job.error = str(exc)
+                if job.attempts >= self.max_attempts:
+                    logger.warning("Image variants failed for %s: %s", job.url, exc)
+                    job.state = "failed"
+                    self._seen.pop(job.url, None)
+                    break
+                await asyncio.sleep(PIPELINE_RETRY_DELAY * 2 ** (job.attempts - 1))
+            else:
+                job.state = "done"
+                job.error = None
+                break
+        job.finished_at = time.time()
+
+    def stats(self):
+        states = {}
+        for job in self.jobs.values():
+            states[job.state] = states.get(job.state, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+            "formats": list(VARIANT_FORMATS),
+            "jobs": states,
+        }
+
+
+pipeline = ImagePipeline()
+
+
+class OnDemandResizer:
+    """Render a source image at a requested width/quality/format, once.
+
+    Results are cached on disk keyed by the request; sources are immutable
+    (upload paths are timestamped) so a cached file never goes stale.
+    """
+
+    def __init__(self, directory=RESIZE_CACHE_DIR, max_bytes=RESIZE_CACHE_MAX_BYTES, workers=RESIZE_WORKERS):
+        self.cache = DiskCache(directory, max_bytes)
+        self.workers = workers
+        self.executor = None
+        self._renders = SingleFlight()
+
+    async def start(self):
+        if self.executor is None:
+            await asyncio.to_thread(self.cache.load)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def render(self, source_path, width, quality, fmt):
+        """Return the path of the cached rendition, rendering it on a miss.
+
+        ``source_path`` is a path in the bucket; the image is always fetched
+        from our own storage, whatever host the request named.
+        """
+        path = self.cache.path_for(f"{source_path}|{width}|{quality}|{fmt}", f".{fmt}")
+        if self.cache.get(path):
+            return path
+
+        async def fetch():
+            data = await storage.download(storage.public_url(source_path))
+            loop = asyncio.get_running_loop()
+            body = await loop.run_in_executor(self.executor, resize_image, data, width, fmt, quality)
+            await asyncio.to_thread(self.cache.put, path, body)
+            return path
+
+        return await self._renders.do(path, fetch)
+
+
+resizer = OnDemandResizer()
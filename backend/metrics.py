@@ -0,0 +1,167 @@
+"""Prometheus-format metrics for the proxy.
+
+Recording is a handful of dict lookups and integer increments per request:
+histograms keep one counter per bucket and are only made cumulative when
+``/metrics`` is scraped.
+"""
+import re
+import time
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Keep label cardinality bounded: anything not listed is reported as "other".
+ROUTE_PATTERNS = (
+    (re.compile(r"^/projects/[^/]+$"), "/projects/[slug]"),
+    (re.compile(r"^/_next/static/"), "/_next/static/[...]"),
+    (re.compile(r"^/_next/image"), "/_next/image"),
+    (re.compile(r"^/public/"), "/public/[...]"),
+    (re.compile(r"^/api/admin/upload/resumable/"), "/api/admin/upload/resumable/[id]"),
+    (re.compile(r"^/api/proxy/profiler/"), "/api/proxy/profiler/[name]"),
+    (re.compile(r"^/_next/data/"), "/_next/data/[...]"),
+)
+KNOWN_ROUTES = {
+    "/", "/about", "/contact", "/projects", "/login", "/admin", "/favicon.ico",
+    "/img", "/metrics", "/api/projects", "/api/projects/search",
+    "/api/admin/login", "/api/admin/upload", "/api/admin/upload/batch", "/api/admin/upload/resumable",
+    "/api/admin/projects/create", "/api/admin/projects/update", "/api/admin/projects/delete",
+    "/api/proxy/pool", "/api/proxy/cache", "/api/proxy/images", "/api/proxy/admission", "/api/proxy/profiler",
+    "/api/proxy/uploads", "/api/proxy/capture",
+}
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+def normalize_route(path):
+    if path in KNOWN_ROUTES:
+        return path
+    for pattern, name in ROUTE_PATTERNS:
+        if pattern.match(path):
+            return name
+    return "other"
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in self._series.items():
+            base = _format_labels(label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, kind="counter"):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self._values = {}
+
+    def inc(self, labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self, label_names):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{{{_format_labels(label_names, labels)}}} {value}")
+        return lines
+
+
+def _format_labels(names, values):
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, values))
+
+
+REQUEST_LABELS = ("route", "method", "status")
+TRAFFIC_LABELS = ("route", "method")
+
+request_duration = Histogram("proxy_request_duration_seconds", "Total time spent handling a request.")
+upstream_duration = Histogram("proxy_upstream_duration_seconds", "Time until the upstream returned response headers.")
+requests_total = Counter("proxy_requests_total", "Requests handled.")
+request_bytes = Counter("proxy_request_bytes_total", "Request body bytes received from clients.")
+response_bytes = Counter("proxy_response_bytes_total", "Response body bytes sent to clients.")
+in_flight = Counter("proxy_requests_in_flight", "Requests currently being handled.", kind="gauge")
+
+
+def record_upstream(request, started):
+    """Note the upstream time for the current request; read back by the middleware."""
+    request.state.upstream_seconds = time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so response bodies are counted without buffering."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = normalize_route(scope["path"])
+        method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+        state = scope.setdefault("state", {})
+        traffic = (route, method)
+        counts = {"in": 0, "out": 0, "status": 500}
+        started = time.perf_counter()
+        in_flight.inc((route,))
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                counts["in"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                counts["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                counts["out"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            in_flight.inc((route,), -1)
+            labels = (route, method, str(counts["status"]))
+            request_duration.observe(labels, time.perf_counter() - started)
+            requests_total.inc(labels)
+            upstream = state.get("upstream_seconds")
+            if upstream is not None:
+                upstream_duration.observe(labels, upstream)
+            request_bytes.inc(traffic, counts["in"])
+            response_bytes.inc(traffic, counts["out"])
+
+
+def render(extra_gauges=(), extra_counters=()):
+    """Render all metrics; the extras are iterables of (name, help, value)."""
+    lines = []
+    lines += request_duration.render(REQUEST_LABELS)
+    lines += upstream_duration.render(REQUEST_LABELS)
+    lines += requests_total.render(REQUEST_LABELS)
+    lines += request_bytes.render(TRAFFIC_LABELS)
+    lines += response_bytes.render(TRAFFIC_LABELS)
+    lines += in_flight.render(("route",))
+    for kind, extras in (("gauge", extra_gauges), ("counter", extra_counters)):
+        for name, help_text, value in extras:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
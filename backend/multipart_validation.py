@@ -0,0 +1,161 @@
+"""Streaming validation of multipart uploads on the admin routes.
+
+Next.js only checks file size and type after it has buffered and parsed the
+whole form. Here the body is parsed chunk by chunk as it is forwarded, so an
+oversized or non-image upload is rejected as soon as the offending bytes
+arrive and the rest never reaches Next.js.
+"""
+import os
+
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+# Same limits and messages as validateFile() in the Next.js routes.
+MAX_FILE_SIZE = int(os.environ.get("PROXY_UPLOAD_MAX_FILE_BYTES", str(5 * 1024 * 1024)))
+MAX_TOTAL_SIZE = int(os.environ.get("PROXY_UPLOAD_MAX_TOTAL_BYTES", str(110 * 1024 * 1024)))
+ALLOWED_TYPES = {"image/jpeg", "image/png", "image/webp"}
+
+UPLOAD_PATH_PREFIX = "/api/admin/projects/"
+UPLOAD_PATHS = {"/api/admin/upload"}
+
+
+class UploadRejected(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def is_upload_route(method, path):
+    return method in ("POST", "PUT") and (path.startswith(UPLOAD_PATH_PREFIX) or path in UPLOAD_PATHS)
+
+
+def sniff_image_type(head):
+    """Return the MIME type implied by the first bytes of a file, or None."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def multipart_boundary(content_type):
+    mime, options = parse_options_header(content_type)
+    if mime != b"multipart/form-data":
+        return None
+    return options.get(b"boundary")
+
+
+def check_declared_length(headers, max_total=MAX_TOTAL_SIZE):
+    length = headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_total:
+        raise UploadRejected(413, f"Upload too large. Maximum request size is {max_total // (1024 * 1024)}MB.")
+
+
+class _Part:
+    __slots__ = ("headers", "filename", "content_type", "size", "head", "checked")
+
+    def __init__(self):
+        self.headers = {}
+        self.filename = None
+        self.content_type = None
+        self.size = 0
+        self.head = b""
+        self.checked = False
+
+
+class MultipartValidator:
+    """Incrementally parse a multipart body and enforce the upload limits.
+
+    ``feed`` raises ``UploadRejected`` on the first violation. Empty file
+    parts (a file input left blank) are ignored, as in the Next.js routes.
+    """
+
+    SNIFF_BYTES = 12
+
+    def __init__(self, boundary, max_file_size=MAX_FILE_SIZE, max_total_size=MAX_TOTAL_SIZE):
+        self.max_file_size = max_file_size
+        self.max_total_size = max_total_size
+        self.total = 0
+        self.files = 0
+        self._part = None
+        self._field = b""
+        self._value = b""
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk):
+        self.total += len(chunk)
+        if self.total > self.max_total_size:
+            raise UploadRejected(413, f"Upload too large. Maximum request size is {self.max_total_size // (1024 * 1024)}MB.")
+        self._parser.write(chunk)
+
+    def _on_part_begin(self):
+        self._part = _Part()
+
+    def _on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._part.headers[self._field.lower()] = self._value
+        self._field = b""
+        self._value = b""
+
+    def _on_headers_finished(self):
+        part = self._part
+        _, options = parse_options_header(part.headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if filename is not None:
+            part.filename = filename.decode("utf-8", "replace")
+            part.content_type = part.headers.get(b"content-type", b"").decode("latin-1").strip().lower()
+
+    def _on_part_data(self, data, start, end):
+        part = self._part
+        if part.filename is None:
+            return
+        part.size += end - start
+        if part.size > self.max_file_size:
+            raise UploadRejected(400, f"File too large: {part.filename}. Maximum size is {self.max_file_size // (1024 * 1024)}MB.")
+        if not part.checked:
+            part.head += data[start:min(end, start + self.SNIFF_BYTES)]
+            if len(part.head) >= self.SNIFF_BYTES:
+                self._check_type(part)
+
+    def _on_part_end(self):
+        part = self._part
+        if part.filename is not None and part.size > 0:
+            if not part.checked:
+                self._check_type(part)
+            self.files += 1
+        self._part = None
+
+    @staticmethod
+    def _check_type(part):
+        part.checked = True
+        if part.content_type not in ALLOWED_TYPES or sniff_image_type(part.head) is None:
+            raise UploadRejected(400, f"Invalid file type: {part.filename}. Only JPEG, PNG, and WebP are allowed.")
+
+
+async def validated_stream(request):
+    """Yield the request body unchanged, validating it on the way through."""
+    boundary = multipart_boundary(request.headers.get("content-type", ""))
+    if boundary is None:
+        async for chunk in request.stream():
+            yield chunk
+        return
+    validator = MultipartValidator(boundary)
+    async for chunk in request.stream():
+        if chunk:
+            validator.feed(chunk)
+        yield chunk
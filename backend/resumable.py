@@ -0,0 +1,320 @@
+"""Resumable uploads following the tus 1.0 protocol.
+
+Supports the core protocol plus the creation, checksum and termination
+extensions. Chunks are appended to a spool file as they arrive, so memory
+use does not depend on the file size, and the spool file's length is the
+upload offset: an interrupted PATCH keeps whatever reached the disk and the
+client resumes from there after a HEAD. A chunk sent with
+``Upload-Checksum`` is verified and rolled back if it does not match.
+
+Once the last byte arrives the file is validated like any other project
+image and streamed from disk to Supabase Storage, unless the same content
+was already stored for the project. The SHA-256 used for that lookup is
+computed as chunks are appended; only an upload resumed after a restart has
+its spool file hashed again.
+
+Spool and record files are written from worker threads, so a slow disk
+holds up only the upload that is waiting on it, not the event loop.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from dedup import HASH_CHUNK, content_index, new_hasher
+from multipart_validation import ALLOWED_TYPES, UploadRejected, sniff_image_type
+from storage import StorageError, storage
+from uploads import UPLOAD_FOLDERS, sanitize_file_name
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,checksum,termination"
+CHECKSUM_ALGORITHMS = {"sha1": hashlib.sha1, "sha256": hashlib.sha256, "md5": hashlib.md5}
+
+RESUMABLE_DIR = os.environ.get("RESUMABLE_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "invera-uploads"))
+RESUMABLE_MAX_BYTES = int(os.environ.get("RESUMABLE_UPLOAD_MAX_BYTES", str(50 * 1024 * 1024)))
+# Unfinished uploads (and the record of finished ones) are kept this long.
+RESUMABLE_EXPIRY = float(os.environ.get("RESUMABLE_UPLOAD_EXPIRY", str(24 * 3600)))
+READ_CHUNK = 256 * 1024
+
+
+def parse_metadata(header):
+    """Decode ``Upload-Metadata``: comma-separated ``key base64value`` pairs."""
+    metadata = {}
+    for item in (header or "").split(","):
+        key, _, value = item.strip().partition(" ")
+        if not key:
+            continue
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode() if value else ""
+        except (ValueError, UnicodeDecodeError):
+            raise UploadRejected(400, f"Invalid Upload-Metadata value for {key}")
+    return metadata
+
+
+def parse_checksum(header):
+    """Return ``(hasher, expected digest)`` for an ``Upload-Checksum`` header."""
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(" ")
+    factory = CHECKSUM_ALGORITHMS.get(algorithm.lower())
+    if factory is None:
+        raise UploadRejected(400, f"Unsupported checksum algorithm: {algorithm}")
+    try:
+        return factory(), base64.b64decode(value, validate=True)
+    except ValueError:
+        raise UploadRejected(400, "Invalid Upload-Checksum value")
+
+
+class Upload:
+    def __init__(self, id, length, filename, filetype, folder, slug, created_at, url=None, error=None,
+                 project_id=None):
+        self.id = id
+        self.length = length
+        self.filename = filename
+        self.filetype = filetype
+        self.folder = folder
+        self.slug = slug
+        self.created_at = created_at
+        self.url = url
+        self.error = error
+        self.project_id = project_id
+        self.lock = asyncio.Lock()
+        # Running content hash and how many bytes it covers; not persisted.
+        self.hasher = None
+        self.hashed = 0
+
+    def to_json(self):
+        return {
+            "id": self.id,
+            "length": self.length,
+            "filename": self.filename,
+            "filetype": self.filetype,
+            "folder": self.folder,
+            "slug": self.slug,
+            "created_at": self.created_at,
+            "url": self.url,
+            "error": self.error,
+            "project_id": self.project_id,
+        }
+
+
+class ResumableUploads:
+    def __init__(self, directory=RESUMABLE_DIR, max_bytes=RESUMABLE_MAX_BYTES, expiry=RESUMABLE_EXPIRY):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.expiry = expiry
+        self._uploads = {}
+        self.completed = 0
+        self.checksum_failures = 0
+
+    def start(self):
+        """Reload uploads left by a previous process and drop expired ones."""
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    upload = Upload(**json.load(f))
+            except (OSError, ValueError, TypeError):
+                continue
+            self._uploads[upload.id] = upload
+        # Nothing is being served yet, so the files can go synchronously.
+        for upload in self._expired():
+            self._uploads.pop(upload.id)
+            self._remove_files(upload)
+
+    def _data_path(self, upload):
+        return os.path.join(self.directory, upload.id + ".bin")
+
+    def _info_path(self, upload):
+        return os.path.join(self.directory, upload.id + ".json")
+
+    async def _save(self, upload):
+        await asyncio.to_thread(self._write_info, self._info_path(upload), upload.to_json())
+
+    @staticmethod
+    def _write_info(path, record):
+        with open(path + ".tmp", "w") as f:
+            json.dump(record, f)
+        os.replace(path + ".tmp", path)
+
+    def offset(self, upload):
+        if upload.url:
+            return upload.length
+        try:
+            return os.path.getsize(self._data_path(upload))
+        except FileNotFoundError:
+            return 0
+
+    def _expired(self):
+        cutoff = time.time() - self.expiry
+        return [u for u in self._uploads.values() if u.created_at < cutoff and not u.lock.locked()]
+
+    async def expire(self):
+        for upload in self._expired():
+            await self.remove(upload)
+
+    async def create(self, length, metadata):
+        if length < 0:
+            raise UploadRejected(400, "Invalid Upload-Length")
+        if length > self.max_bytes:
+            raise UploadRejected(413, f"File too large. Maximum size is {self.max_bytes // (1024 * 1024)}MB.")
+        filetype = metadata.get("filetype") or metadata.get("type") or ""
+        filename = metadata.get("filename") or metadata.get("name") or "file"
+        if filetype not in ALLOWED_TYPES:
+            raise UploadRejected(400, f"Invalid file type: {filename}. Only JPEG, PNG, and WebP are allowed.")
+        folder = metadata.get("folder") or "gallery"
+        if folder not in UPLOAD_FOLDERS:
+            raise UploadRejected(400, f"Invalid folder: {folder}")
+
+        await self.expire()
+        upload = Upload(
+            uuid.uuid4().hex, length, filename, filetype, folder,
+            sanitize_file_name(metadata.get("projectSlug") or "temp"), time.time(),
+            project_id=metadata.get("projectId") or None,
+        )
+        await asyncio.to_thread(_create_empty, self._data_path(upload))
+        upload.hasher = new_hasher()
+        await self._save(upload)
+        self._uploads[upload.id] = upload
+        return upload
+
+    def get(self, upload_id):
+        upload = self._uploads.get(upload_id)
+        if upload is None:
+            raise UploadRejected(404, "Upload not found")
+        return upload
+
+    async def append(self, upload, offset, chunks, checksum_header=None):
+        """Append a PATCH body at ``offset``; returns the new offset."""
+        if upload.lock.locked():
+            raise UploadRejected(409, "Another request is writing to this upload")
+        async with upload.lock:
+            current = self.offset(upload)
+            if offset != current:
+                raise UploadRejected(409, f"Upload-Offset mismatch: expected {current}")
+            checksum = parse_checksum(checksum_header)
+            # Work on a copy so a rolled-back chunk leaves the hash as it was.
+            hasher = upload.hasher.copy() if upload.hasher is not None and upload.hashed == current else None
+            data_path = self._data_path(upload)
+            complete = False
+            f = await asyncio.to_thread(open, data_path, "r+b")
+            try:
+                f.seek(current)
+                written = 0
+                try:
+                    async for chunk in chunks:
+                        if not chunk:
+                            continue
+                        if current + written + len(chunk) > upload.length:
+                            raise UploadRejected(413, "Chunk exceeds Upload-Length")
+                        await asyncio.to_thread(f.write, chunk)
+                        written += len(chunk)
+                        if checksum:
+                            checksum[0].update(chunk)
+                        if hasher is not None:
+                            hasher.update(chunk)
+                    complete = True
+                finally:
+                    # A chunk that cannot be verified is not kept; without a
+                    # checksum whatever arrived before a disconnect is.
+                    if checksum and not complete:
+                        await asyncio.to_thread(f.truncate, current)
+                    elif not complete and hasher is not None:
+                        upload.hasher, upload.hashed = hasher, current + written
+                if checksum and checksum[0].digest() != checksum[1]:
+                    await asyncio.to_thread(f.truncate, current)
+                    self.checksum_failures += 1
+                    raise UploadRejected(460, "Checksum mismatch")
+                await asyncio.to_thread(f.flush)
+            finally:
+                await asyncio.to_thread(f.close)
+            if hasher is not None:
+                upload.hasher, upload.hashed = hasher, current + written
+            return current + written
+
+    async def finish(self, upload):
+        """Validate the assembled file and stream it to storage; returns the URL."""
+        async with upload.lock:
+            if upload.url:
+                return upload.url
+            data_path = self._data_path(upload)
+            head = await asyncio.to_thread(_read_head, data_path, 16)
+            if sniff_image_type(head) is None:
+                upload.error = f"Invalid file type: {upload.filename}. Only JPEG, PNG, and WebP are allowed."
+                await self._save(upload)
+                raise UploadRejected(400, upload.error)
+
+            if upload.hasher is not None and upload.hashed == upload.length:
+                digest = upload.hasher.hexdigest()
+            else:
+                digest = await asyncio.to_thread(_hash_file, data_path)
+            path = f"{upload.folder}/{upload.slug}/{int(time.time() * 1000)}-{sanitize_file_name(upload.filename)}"
+            try:
+                url = await content_index.store(
+                    upload.folder, upload.project_id, digest, upload.length,
+                    lambda: storage.upload(path, _read_file(data_path), upload.filetype, size=upload.length),
+                )
+            except StorageError as e:
+                # The spooled file is kept; a zero-length PATCH retries.
+                upload.error = str(e)
+                await self._save(upload)
+                raise UploadRejected(502, upload.error)
+            upload.url, upload.error = url, None
+            await self._save(upload)
+            await asyncio.to_thread(os.remove, data_path)
+            self.completed += 1
+            return url
+
+    async def remove(self, upload):
+        self._uploads.pop(upload.id, None)
+        await asyncio.to_thread(self._remove_files, upload)
+
+    def _remove_files(self, upload):
+        for path in (self._data_path(upload), self._info_path(upload)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return {
+            "active": sum(1 for u in self._uploads.values() if not u.url),
+            "completed": self.completed,
+            "checksum_failures": self.checksum_failures,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def _create_empty(path):
+    open(path, "wb").close()
+
+
+def _read_head(path, size):
+    with open(path, "rb") as f:
+        return f.read(size)
+
+
+def _hash_file(path):
+    hasher = new_hasher()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+async def _read_file(path):
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, READ_CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+resumable_uploads = ResumableUploads()
@@ -0,0 +1,174 @@
+"""In-memory inverted index for project search.
+
+Name, location, client, summary and materials are tokenised into a weighted
+inverted index. A query term matches indexed tokens exactly, by prefix
+(binary search over the sorted vocabulary) or, for typos and partial words,
+by trigram similarity. Every term has to match; documents are ranked by the
+summed field weight of their best match per term, newest first on ties.
+
+The index is kept current by the project catalogue: creates, updates and
+deletes touch only the postings of that one project.
+"""
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+
+from catalog import catalog
+
+# Field -> weight of a token found in it.
+FIELD_WEIGHTS = {"name": 5.0, "location": 3.0, "client_name": 2.0, "summary": 1.0, "materials": 1.0}
+EXACT, PREFIX = 1.0, 0.7
+# Trigram matches score below prefix matches and need this Jaccard similarity.
+TRIGRAM_SCORE = 0.5
+TRIGRAM_MIN_SIMILARITY = 0.3
+MAX_PREFIX_EXPANSIONS = 50
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", str(text or "")).lower()
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN.findall(text)
+
+
+def trigrams(token):
+    """Trigrams with word-boundary markers, so short words still overlap
+    enough to match a typo; tokens under three letters only match by prefix."""
+    if len(token) < 3:
+        return set()
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    fields = tuple(FIELD_WEIGHTS)
+
+    def __init__(self):
+        self._docs = {}          # id -> {"category", "sort_key", "tokens": {token: weight}}
+        self._postings = {}      # token -> {id: weight}
+        self._vocabulary = []    # sorted tokens, for prefix lookups
+        self._trigrams = {}      # trigram -> set of tokens
+        self.queries = 0
+
+    # --- maintenance ------------------------------------------------------
+
+    def sync(self, projects):
+        """Bring the index in line with a full catalogue load, touching only
+        projects that were added, changed or removed."""
+        seen = set()
+        for project in projects:
+            seen.add(str(project["id"]))
+            self.upsert(project)
+        for doc_id in [d for d in self._docs if d not in seen]:
+            self.remove(doc_id)
+
+    def upsert(self, project):
+        doc_id = str(project["id"])
+        tokens = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(project.get(field)):
+                if tokens.get(token, 0) < weight:
+                    tokens[token] = weight
+        doc = {
+            "category": project.get("category"),
+            "sort_key": (project.get("created_at") or "", doc_id),
+            "tokens": tokens,
+        }
+        old = self._docs.get(doc_id)
+        if old is not None and old["tokens"] == tokens:
+            old.update(category=doc["category"], sort_key=doc["sort_key"])
+            return
+        if old is not None:
+            self._unindex(doc_id, old["tokens"])
+        self._docs[doc_id] = doc
+        for token, weight in tokens.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                insort(self._vocabulary, token)
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+            postings[doc_id] = weight
+
+    def remove(self, project_id):
+        doc = self._docs.pop(str(project_id), None)
+        if doc is not None:
+            self._unindex(str(project_id), doc["tokens"])
+
+    def _unindex(self, doc_id, tokens):
+        for token in tokens:
+            postings = self._postings[token]
+            postings.pop(doc_id, None)
+            if postings:
+                continue
+            del self._postings[token]
+            del self._vocabulary[bisect_left(self._vocabulary, token)]
+            for gram in trigrams(token):
+                grams = self._trigrams[gram]
+                grams.discard(token)
+                if not grams:
+                    del self._trigrams[gram]
+
+    # --- queries ------------------------------------------------------------
+
+    def _expand(self, term):
+        """Return ``{token: match quality}`` for one query term."""
+        matches = {}
+        start = bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            matches[token] = EXACT if token == term else PREFIX
+        term_grams = trigrams(term)
+        if term_grams:
+            shared = Counter(t for gram in term_grams for t in self._trigrams.get(gram, ()))
+            for token, count in shared.items():
+                similarity = count / (len(term_grams) + len(trigrams(token)) - count)
+                if similarity >= TRIGRAM_MIN_SIMILARITY and token not in matches:
+                    matches[token] = TRIGRAM_SCORE * similarity
+        return matches
+
+    def search(self, query, category=None):
+        """Return ``(ranked [(id, score)], category facet counts)``."""
+        self.queries += 1
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return [], {}
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token, quality in self._expand(term).items():
+                for doc_id, weight in self._postings[token].items():
+                    score = quality * weight
+                    if score > term_scores.get(doc_id, 0):
+                        term_scores[doc_id] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {d: s + term_scores[d] for d, s in scores.items() if d in term_scores}
+            if not scores:
+                return [], {}
+
+        # Facets describe every match, so the UI can show counts per category
+        # while one of them is selected.
+        facets = Counter(self._docs[d]["category"] for d in scores)
+        ranked = [
+            (d, s) for d, s in scores.items()
+            if category is None or self._docs[d]["category"] == category
+        ]
+        ranked.sort(key=lambda item: (item[1], self._docs[item[0]]["sort_key"]), reverse=True)
+        return ranked, dict(facets)
+
+    def stats(self):
+        return {
+            "documents": len(self._docs),
+            "tokens": len(self._vocabulary),
+            "trigrams": len(self._trigrams),
+            "queries": self.queries,
+        }
+
+
+search_index = SearchIndex()
+catalog.add_listener(search_index)
@@ -1,10 +1,535 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import Response
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+
 import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from PIL import UnidentifiedImageError
+from starlette.background import BackgroundTask
+from starlette.datastructures import UploadFile
+from starlette.requests import ClientDisconnect
+
+from admin_session import COOKIE_NAME, sessions, sign_set_cookie, upstream_cookie_header
+from admission import AdmissionMiddleware, admission
+from cache import MUTATION_PATHS, response_cache
+from capture import CaptureMiddleware, capture
+from catalog import MAX_PAGE_SIZE, InvalidQuery, catalog, parse_fields
+from compression import compressed_bodies, maybe_compress
+from dedup import content_index
+from etags import ETAGS_ENABLED, etag_index, is_not_modified, last_modified_timestamp, tag_response
+import metrics
+import static_files
+import timing
+from images import CONTENT_TYPES, RESIZE_FORMATS, RESIZE_QUALITIES, RESIZE_WIDTHS, pipeline, resizer
+from multipart_validation import UploadRejected, check_declared_length, is_upload_route, validated_stream
+from singleflight import SingleFlight
+from resumable import CHECKSUM_ALGORITHMS, TUS_EXTENSIONS, TUS_VERSION, parse_metadata, resumable_uploads
+from search import search_index
+from storage import StorageError, storage
+from supabase_rest import RestError, rest
+from upstream import IDEMPOTENT_METHODS, CircuitOpenError, pool
+from uploads import BATCH_MAX_FILES, UPLOAD_FOLDERS, sanitize_file_name, uploader
+
+# Stream request and response bodies instead of buffering them in memory.
+PROXY_STREAMING = os.environ.get("PROXY_STREAMING", "true").lower() == "true"
+# Admin API routes Next.js serves without a session.
+ADMIN_API_PREFIX = "/api/admin/"
+ADMIN_LOGIN_PATH = "/api/admin/login"
+
+page_fetches = SingleFlight()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await pool.start()
+    await storage.start()
+    await rest.start()
+    resumable_uploads.start()
+    await pipeline.start()
+    await resizer.start()
+    await capture.start()
+    try:
+        yield
+    finally:
+        await capture.close()
+        await resizer.close()
+        await pipeline.close()
+        await rest.close()
+        await storage.close()
+        await pool.close()
+
+
+app = FastAPI(lifespan=lifespan)
+# Middleware added first runs innermost: timing only sees admitted requests,
+# admission runs inside metrics so its rejections are counted, and capture
+# sees everything a client sent.
+app.add_middleware(timing.TimingMiddleware)
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(CaptureMiddleware)
+
+
+@app.exception_handler(UploadRejected)
+async def upload_rejected(request: Request, exc: UploadRejected):
+    return JSONResponse({"error": exc.message}, status_code=exc.status_code)
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open(request: Request, exc: CircuitOpenError):
+    return JSONResponse(
+        {"error": "Service temporarily unavailable"},
+        status_code=503,
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
+@app.exception_handler(httpx.TimeoutException)
+async def upstream_timeout(request: Request, exc: httpx.TimeoutException):
+    return JSONResponse({"error": "Upstream timed out"}, status_code=504)
+
+
+@app.exception_handler(httpx.TransportError)
+async def upstream_unreachable(request: Request, exc: httpx.TransportError):
+    return JSONResponse({"error": "Upstream unavailable"}, status_code=502)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Expose proxy metrics in the Prometheus text format."""
+    pool_stats = pool.stats()
+    cache_stats = response_cache.stats()
+    gauges = [
+        ("proxy_upstream_pool_in_flight", "Upstream requests holding or waiting for a connection.", pool_stats["in_flight"]),
+        ("proxy_upstream_pool_max_connections", "Upstream connection pool size.", pool_stats["max_connections"]),
+        ("proxy_upstreams_healthy", "Next.js instances currently in rotation.", sum(u["healthy"] for u in pool_stats["upstreams"])),
+        ("proxy_cache_entries", "Responses held in the page cache.", cache_stats["entries"]),
+        ("proxy_cache_bytes", "Bytes held in the page cache.", cache_stats["bytes"]),
+        ("proxy_admission_active", "Requests holding a concurrency slot.", admission.concurrency.active),
+        ("proxy_admission_waiting", "Requests waiting in the admission queue.", admission.concurrency.stats()["waiting"]),
+        ("proxy_resumable_uploads_active", "Resumable uploads started but not yet stored.", resumable_uploads.stats()["active"]),
+        ("proxy_image_queue_depth", "Images waiting for variant generation.", pipeline.stats()["queue_depth"]),
+    ]
+    counters = [
+        ("proxy_upstream_pool_saturated_total", "Requests that found the upstream pool full.", pool_stats["saturated_total"]),
+        ("proxy_cache_hits_total", "Page cache hits.", cache_stats["hits"]),
+        ("proxy_cache_misses_total", "Page cache misses.", cache_stats["misses"]),
+        ("proxy_not_modified_total", "Conditional requests answered with 304.", etag_index.not_modified),
+        ("proxy_admission_rejected_total", "Requests rejected by the concurrency limiter.", admission.concurrency.rejected_full + admission.concurrency.rejected_timeout),
+        ("proxy_admin_unauthorized_total", "Admin API calls rejected at the proxy without a valid session.", sessions.denied),
+        ("proxy_rate_limited_total", "Requests rejected by per-client rate limits.", admission.public_rate.limited + admission.admin_rate.limited),
+        ("proxy_upload_dedup_hits_total", "Uploads answered with an already stored object.", content_index.hits),
+        ("proxy_capture_dropped_total", "Traffic capture records dropped (queue full or log at its cap).", capture.dropped),
+    ]
+    return Response(metrics.render(gauges, counters), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/proxy/pool")
+async def pool_stats(request: Request):
+    """Report upstream connection pool usage so the limits can be sized."""
+    if not _is_admin(request):
+        return _unauthorized()
+    return JSONResponse(pool.stats())
+
+
+@app.get("/api/proxy/cache")
+async def cache_stats(request: Request):
+    """Report response cache occupancy and hit rate."""
+    if not _is_admin(request):
+        return _unauthorized()
+    return JSONResponse({
+        **response_cache.stats(),
+        "coalescing": page_fetches.stats(),
+        "compression": compressed_bodies.stats(),
+        "etags": etag_index.stats(),
+        "catalog": catalog.stats(),
+        "search": search_index.stats(),
+    })
+
+
+@app.get("/api/proxy/admission")
+async def admission_stats(request: Request):
+    """Report concurrency limiter, rate limiter and admin session activity."""
+    if not _is_admin(request):
+        return _unauthorized()
+    return JSONResponse({**admission.stats(), "admin_sessions": sessions.stats()})
+
+
+@app.get("/api/proxy/uploads")
+async def upload_stats(request: Request):
+    """Report batch and resumable upload counts and deduplication savings."""
+    if not _is_admin(request):
+        return _unauthorized()
+    return JSONResponse({
+        "batch": {"uploaded": uploader.uploaded, "failed": uploader.failed},
+        "resumable": resumable_uploads.stats(),
+        "dedup": content_index.stats(),
+    })
+
+
+@app.get("/api/projects")
+async def list_projects(
+    category: str = None, featured: bool = None, cursor: str = None, limit: int = 12, fields: str = None
+):
+    """One page of project cards, newest first.
+
+    ``fields`` projects the card fields (default: all of them); pass the
+    returned ``next_cursor`` back as ``cursor`` for the following page.
+    """
+    try:
+        projection = parse_fields(fields)
+        await catalog.ensure_loaded()
+        projects, next_cursor, total = catalog.page(category, featured, cursor, limit, projection)
+    except InvalidQuery as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except (RestError, httpx.HTTPError):
+        return JSONResponse({"error": "Failed to load projects"}, status_code=502)
+    return JSONResponse({"projects": projects, "next_cursor": next_cursor, "total": total})
+
+
+@app.get("/api/projects/search")
+async def search_projects(q: str = "", category: str = None, limit: int = 20, offset: int = 0):
+    """Ranked project search over name, location, client, summary and materials.
+
+    ``facets.category`` counts every match, ignoring the ``category`` filter.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE or offset < 0:
+        return JSONResponse({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}, status_code=400)
+    try:
+        await catalog.ensure_loaded()
+    except (RestError, httpx.HTTPError):
+        return JSONResponse({"error": "Failed to load projects"}, status_code=502)
+    started = time.perf_counter()
+    ranked, facets = search_index.search(q, category)
+    took = time.perf_counter() - started
+    results = []
+    for project_id, score in ranked[offset:offset + limit]:
+        card = catalog.get(project_id)
+        if card is not None:
+            results.append({**card, "score": round(score, 3)})
+    return JSONResponse({
+        "query": q,
+        "results": results,
+        "total": len(ranked),
+        "facets": {"category": facets},
+        "took_ms": round(took * 1000, 3),
+    })
+
+
+@app.get("/api/proxy/profiler")
+async def profiler_status(request: Request):
+    """Slow-request profiler settings and the profiles currently on disk."""
+    if not _is_admin(request):
+        return _unauthorized()
+    return JSONResponse({**timing.profiler.stats(), "profiles": timing.profiler.profiles()})
+
+
+@app.put("/api/proxy/profiler")
+async def profiler_configure(request: Request):
+    """Change ``sample_rate`` (0-1) and/or ``threshold_ms`` without a restart."""
+    if not _is_admin(request):
+        return _unauthorized()
+    try:
+        settings = await request.json()
+        timing.profiler.configure(
+            sample_rate=None if settings.get("sample_rate") is None else float(settings["sample_rate"]),
+            threshold_ms=None if settings.get("threshold_ms") is None else float(settings["threshold_ms"]),
+        )
+    except (ValueError, TypeError, AttributeError):
+        return JSONResponse({"error": "Expected JSON with numeric sample_rate and/or threshold_ms"}, status_code=400)
+    return JSONResponse(timing.profiler.stats())
+
+
+@app.get("/api/proxy/capture")
+async def capture_status(request: Request):
+    """Traffic capture settings and how many records were written or dropped."""
+    if not _is_admin(request):
+        return _unauthorized()
+    return JSONResponse(capture.stats())
+
+
+@app.put("/api/proxy/capture")
+async def capture_configure(request: Request):
+    """Change ``sample_rate`` (0-1) without a restart; 0 stops capturing."""
+    if not _is_admin(request):
+        return _unauthorized()
+    try:
+        settings = await request.json()
+        capture.configure(sample_rate=float(settings["sample_rate"]))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JSONResponse({"error": "Expected JSON with a numeric sample_rate"}, status_code=400)
+    return JSONResponse(capture.stats())
+
+
+@app.get("/api/proxy/profiler/{name}")
+async def profiler_download(request: Request, name: str):
+    if not _is_admin(request):
+        return _unauthorized()
+    if name not in timing.profiler.profiles():
+        return JSONResponse({"error": "Profile not found"}, status_code=404)
+    return FileResponse(os.path.join(timing.profiler.directory, name), media_type="text/plain")
+
+
+@app.get("/api/proxy/images")
+async def image_pipeline_status(request: Request, job: str = None, url: str = None):
+    """Report image variant queue depth and job states, or a single job."""
+    if not _is_admin(request):
+        return _unauthorized()
+    if job or url:
+        matches = [j.to_dict() for j in pipeline.jobs.values() if j.id == job or j.url == url]
+        if not matches:
+            return JSONResponse({"error": "Job not found"}, status_code=404)
+        return JSONResponse(matches[-1])
+    return JSONResponse(pipeline.stats())
+
+
+@app.post("/api/admin/upload/batch")
+async def batch_upload(request: Request):
+    """Upload a whole gallery in one request, concurrently.
+
+    Form fields match /api/admin/upload (``folder``, ``projectSlug``) with
+    any number of ``files``, plus ``projectId`` when the gallery belongs to
+    an existing project, which scopes upload deduplication. The body is
+    checked as it arrives, like the proxied upload routes, and one invalid
+    file rejects the batch before anything is uploaded. Otherwise URLs come back in upload order, with
+    ``null`` and an entry in ``errors`` for each file storage failed on; the
+    response is 400 only when nothing was stored.
+    """
+    if not _is_admin(request):
+        return _unauthorized()
+    check_declared_length(request.headers)
+
+    form = await _validated_request(request).form(max_files=BATCH_MAX_FILES)
+    files = [f for f in form.getlist("files") if isinstance(f, UploadFile) and f.size]
+    if not files:
+        return JSONResponse({"error": "No files provided"}, status_code=400)
+    folder = form.get("folder") or "gallery"
+    if folder not in UPLOAD_FOLDERS:
+        return JSONResponse({"error": f"Invalid folder: {folder}"}, status_code=400)
+    slug = sanitize_file_name(form.get("projectSlug") or "temp")
+
+    results = await uploader.upload(files, folder, slug, form.get("projectId") or None)
+    urls = [r["url"] for r in results]
+    errors = [{"index": i, "name": r["name"], "error": r["error"]} for i, r in enumerate(results) if r["error"]]
+    for url in filter(None, urls):
+        pipeline.enqueue(url)
+    if not any(urls):
+        return JSONResponse({"error": errors[0]["error"], "urls": urls, "errors": errors}, status_code=400)
+    return JSONResponse({"success": True, "urls": urls, "errors": errors})
+
+
+TUS_HEADERS = {"Tus-Resumable": TUS_VERSION}
+
+
+@app.options("/api/admin/upload/resumable")
+async def resumable_options():
+    return Response(status_code=204, headers={
+        **TUS_HEADERS,
+        "Tus-Version": TUS_VERSION,
+        "Tus-Extension": TUS_EXTENSIONS,
+        "Tus-Max-Size": str(resumable_uploads.max_bytes),
+        "Tus-Checksum-Algorithm": ",".join(CHECKSUM_ALGORITHMS),
+    })
+
+
+@app.post("/api/admin/upload/resumable")
+async def resumable_create(request: Request):
+    """Start a resumable (tus) upload of one project image.
+
+    ``Upload-Metadata`` carries ``filename``, ``filetype`` and optionally
+    ``folder``, ``projectSlug`` and ``projectId``, like the batch upload
+    form fields.
+    """
+    if not _is_admin(request):
+        return _unauthorized()
+    length = request.headers.get("upload-length", "")
+    if not length.isdigit():
+        return JSONResponse({"error": "Upload-Length is required"}, status_code=400, headers=TUS_HEADERS)
+    upload = await resumable_uploads.create(int(length), parse_metadata(request.headers.get("upload-metadata")))
+    return Response(status_code=201, headers={
+        **TUS_HEADERS,
+        "Location": f"/api/admin/upload/resumable/{upload.id}",
+        "Upload-Offset": "0",
+    })
+
+
+@app.head("/api/admin/upload/resumable/{upload_id}")
+async def resumable_offset(request: Request, upload_id: str):
+    if not _is_admin(request):
+        return Response(status_code=401)
+    upload = resumable_uploads.get(upload_id)
+    return Response(status_code=200, headers={
+        **TUS_HEADERS,
+        "Upload-Offset": str(resumable_uploads.offset(upload)),
+        "Upload-Length": str(upload.length),
+        "Cache-Control": "no-store",
+    })
+
+
+@app.get("/api/admin/upload/resumable/{upload_id}")
+async def resumable_status(request: Request, upload_id: str):
+    """Report progress and, once complete, the public URL of an upload."""
+    if not _is_admin(request):
+        return _unauthorized()
+    upload = resumable_uploads.get(upload_id)
+    return JSONResponse({
+        "offset": resumable_uploads.offset(upload),
+        "length": upload.length,
+        "url": upload.url,
+        "error": upload.error,
+    }, headers={"Cache-Control": "no-store"})
+
+
+@app.patch("/api/admin/upload/resumable/{upload_id}")
+async def resumable_append(request: Request, upload_id: str):
+    """Append a chunk; the upload is sent to storage when the last byte arrives."""
+    if not _is_admin(request):
+        return _unauthorized()
+    if request.headers.get("content-type") != "application/offset+octet-stream":
+        return JSONResponse({"error": "Content-Type must be application/offset+octet-stream"}, status_code=415)
+    offset = request.headers.get("upload-offset", "")
+    if not offset.isdigit():
+        return JSONResponse({"error": "Upload-Offset is required"}, status_code=400)
+
+    upload = resumable_uploads.get(upload_id)
+    try:
+        new_offset = await resumable_uploads.append(
+            upload, int(offset), request.stream(), request.headers.get("upload-checksum")
+        )
+    except ClientDisconnect:
+        # Bytes already on disk are kept; the client resumes after a HEAD.
+        return Response(status_code=400)
+
+    headers = {**TUS_HEADERS, "Upload-Offset": str(new_offset)}
+    if new_offset == upload.length:
+        url = await resumable_uploads.finish(upload)
+        pipeline.enqueue(url)
+        headers["X-Upload-Url"] = url
+    return Response(status_code=204, headers=headers)
+
+
+@app.delete("/api/admin/upload/resumable/{upload_id}")
+async def resumable_terminate(request: Request, upload_id: str):
+    if not _is_admin(request):
+        return _unauthorized()
+    await resumable_uploads.remove(resumable_uploads.get(upload_id))
+    return Response(status_code=204, headers=TUS_HEADERS)
+
+
+@app.get("/img")
+async def resized_image(src: str, w: int, q: int = 75, fmt: str = "webp"):
+    """Serve a project image resized for srcset, from the disk cache when possible."""
+    fmt = fmt.lower()
+    source_path = storage.path_from_url(src)
+    if source_path is None:
+        return JSONResponse({"error": "src must be a project image URL"}, status_code=400)
+    if w not in RESIZE_WIDTHS:
+        return JSONResponse({"error": f"w must be one of {', '.join(map(str, RESIZE_WIDTHS))}"}, status_code=400)
+    if q not in RESIZE_QUALITIES:
+        return JSONResponse({"error": f"q must be one of {', '.join(map(str, RESIZE_QUALITIES))}"}, status_code=400)
+    if fmt not in RESIZE_FORMATS:
+        return JSONResponse({"error": f"fmt must be one of {', '.join(sorted(RESIZE_FORMATS))}"}, status_code=400)
+
+    try:
+        path = await resizer.render(source_path, w, q, fmt)
+    except StorageError as exc:
+        # The message names the storage URL; keep it out of the response.
+        if exc.status == 404:
+            return JSONResponse({"error": "Source image not found"}, status_code=404)
+        return JSONResponse({"error": "Failed to fetch the source image"}, status_code=502)
+    except UnidentifiedImageError:
+        return JSONResponse({"error": "Source is not a supported image"}, status_code=415)
+
+    return FileResponse(
+        path,
+        media_type=CONTENT_TYPES[fmt],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
 
-app = FastAPI()
 
-NEXTJS_URL = "http://localhost:3000"
+def _is_admin(request: Request):
+    """True if the request carries a signed admin session (see admin_session.py)."""
+    return sessions.verify(request.cookies.get(COOKIE_NAME))
+
+
+def _unauthorized():
+    sessions.denied += 1
+    return JSONResponse({"error": "Unauthorized"}, status_code=401)
+
+
+def _forward_headers(request: Request):
+    headers = {}
+    for key, value in request.headers.items():
+        lower = key.lower()
+        if lower == "cookie":
+            # Next.js only ever sees the plain marker for a verified session.
+            value = upstream_cookie_header(value)
+            if not value:
+                continue
+        if lower not in ("host", "transfer-encoding"):
+            headers[key] = value
+    return headers
+
+
+def _response_headers(response: httpx.Response, excluded_headers):
+    return {
+        k: v for k, v in response.headers.items()
+        if k.lower() not in excluded_headers
+    }
+
+
+def _has_body(request: Request):
+    return "content-length" in request.headers or "transfer-encoding" in request.headers
+
+
+def _request_content(request: Request, route: str):
+    """Body to send upstream: streamed, and validated on the upload routes."""
+    if not _has_body(request):
+        return None
+    if is_upload_route(request.method, route):
+        check_declared_length(request.headers)
+        return validated_stream(request)
+    return request.stream()
+
+
+async def _read_body(request: Request, route: str):
+    """Whole request body, with the same upload checks as the streamed path."""
+    if not is_upload_route(request.method, route):
+        return await request.body()
+    check_declared_length(request.headers)
+    return b"".join([chunk async for chunk in validated_stream(request)])
+
+
+def _validated_request(request: Request):
+    """``request`` with its body run through the upload validator as it is read."""
+    chunks = validated_stream(request)
+
+    async def receive():
+        try:
+            body = await chunks.__anext__()
+        except StopAsyncIteration:
+            return {"type": "http.request", "body": b"", "more_body": False}
+        return {"type": "http.request", "body": body, "more_body": True}
+
+    return Request(request.scope, receive)
+
+
+@app.post(ADMIN_LOGIN_PATH)
+async def admin_login(request: Request):
+    """Relay the login to Next.js and sign the session cookie it sets."""
+    if not sessions.enabled:
+        return JSONResponse({"error": "Admin login is disabled: ADMIN_SESSION_SECRET is not set"}, status_code=503)
+    with timing.phase(request, "read"):
+        body = await request.body()
+    started = time.perf_counter()
+    response = await pool.request("POST", ADMIN_LOGIN_PATH, headers=_forward_headers(request), content=body)
+    metrics.record_upstream(request, started)
+    headers = _response_headers(response, BUFFERED_EXCLUDED_HEADERS | {"set-cookie"})
+    reply = Response(content=response.content, status_code=response.status_code, headers=headers)
+    for cookie in response.headers.get_list("set-cookie"):
+        reply.headers.append("set-cookie", sign_set_cookie(cookie))
+    return reply
+
 
 @app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS", "HEAD"])
 async def proxy(request: Request, path: str):
@@ -13,38 +538,198 @@ async def proxy(request: Request, path: str):
     We forward as-is to Next.js which has routes at /api/admin/...
     """
     # The path already includes 'api/' prefix from ingress routing
-    target_url = f"{NEXTJS_URL}/{path}"
-    
+    target_url = f"/{path}"
+
     # Rebuild query string
     query_string = str(request.url.query) if request.url.query else ""
     if query_string:
         target_url = f"{target_url}?{query_string}"
-    
-    headers = {}
-    for key, value in request.headers.items():
-        lower = key.lower()
-        if lower not in ("host", "transfer-encoding"):
-            headers[key] = value
-    
-    body = await request.body()
-    
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        response = await client.request(
+
+    route = f"/{path}"
+
+    if request.method in IDEMPOTENT_METHODS:
+        static = static_files.resolve(route)
+        if static is not None:
+            return static_files.StaticFileResponse(*static, request.headers, request.method)
+
+    # Reject unauthenticated admin API calls before any of the body is read.
+    if route.startswith(ADMIN_API_PREFIX) and route != ADMIN_LOGIN_PATH and not _is_admin(request):
+        return _unauthorized()
+
+    headers = _forward_headers(request)
+
+    if response_cache.is_cacheable_request(request.method, route, request.headers):
+        return await _proxy_cached(request, route, target_url, headers)
+
+    if request.method in ("POST", "PUT", "DELETE") and route in MUTATION_PATHS:
+        return await _proxy_mutation(request, route, target_url, headers)
+
+    if PROXY_STREAMING:
+        return await _proxy_streaming(request, route, target_url, headers)
+
+    with timing.phase(request, "read"):
+        body = await _read_body(request, route)
+
+    started = time.perf_counter()
+    if request.method in IDEMPOTENT_METHODS and not body:
+        response, _ = await pool.hedged(request.method, target_url, headers)
+    else:
+        response = await pool.request(request.method, target_url, headers=headers, content=body)
+    metrics.record_upstream(request, started)
+
+    resp_headers = _response_headers(response, BUFFERED_EXCLUDED_HEADERS)
+    if ETAGS_ENABLED and request.method in IDEMPOTENT_METHODS and response.status_code == 200:
+        # The upstream was already asked, but a 304 still saves the transfer.
+        if "etag" not in resp_headers:
+            resp_headers = {**resp_headers, "etag": tag_response({}, response.content)["etag"]}
+        return await _conditional_response(request, response.status_code, resp_headers, response.content)
+    return await _buffered_response(request, response.status_code, resp_headers, response.content)
+
+
+async def _proxy_streaming(request: Request, route: str, target_url: str, headers):
+    """Pipe the request body upstream as it arrives and stream the reply back.
+
+    Raw upstream bytes are relayed untouched, so content-encoding and
+    content-length are kept and nothing is held in memory beyond one chunk.
+    """
+    content = _request_content(request, route)
+    if request.method in IDEMPOTENT_METHODS and content is None:
+        started = time.perf_counter()
+        response, release = await pool.hedged(request.method, target_url, headers, stream=True)
+        metrics.record_upstream(request, started)
+        return _streaming_response(response, release)
+
+    stack = AsyncExitStack()
+    try:
+        lease = await stack.enter_async_context(pool.lease())
+        upstream_request = lease.client.build_request(
             method=request.method,
-            url=target_url,
+            url=lease.url(target_url),
             headers=headers,
-            content=body,
+            content=content,
         )
-    
-    # Filter out hop-by-hop headers
-    excluded_headers = {"transfer-encoding", "content-encoding", "connection"}
-    resp_headers = {
-        k: v for k, v in response.headers.items()
-        if k.lower() not in excluded_headers
-    }
-    
-    return Response(
-        content=response.content,
+        started = time.perf_counter()
+        response = await lease.client.send(upstream_request, stream=True)
+        lease.mark()
+        metrics.record_upstream(request, started)
+        stack.push_async_callback(response.aclose)
+    except BaseException as exc:
+        await stack.__aexit__(type(exc), exc, exc.__traceback__)
+        raise
+
+    return _streaming_response(response, stack.aclose)
+
+
+def _streaming_response(response: httpx.Response, release):
+    excluded_headers = {"transfer-encoding", "connection", "keep-alive"}
+    return StreamingResponse(
+        response.aiter_raw(),
         status_code=response.status_code,
-        headers=resp_headers,
+        headers=_response_headers(response, excluded_headers),
+        background=BackgroundTask(release),
+    )
+
+
+# Hop-by-hop headers plus the ones that stop being true once httpx has
+# decoded and buffered the body.
+BUFFERED_EXCLUDED_HEADERS = {"transfer-encoding", "content-encoding", "content-length", "connection", "keep-alive"}
+
+
+async def _buffered_response(request: Request, status_code: int, headers, body: bytes):
+    """Build a response from a fully read body, compressing it if negotiated."""
+    with timing.phase(request, "compress"):
+        headers, body = await maybe_compress(request.headers.get("accept-encoding"), headers, body)
+    return Response(content=body, status_code=status_code, headers=headers)
+
+
+def _not_modified_response(headers):
+    etag_index.not_modified += 1
+    return Response(status_code=304, headers=headers)
+
+
+async def _conditional_response(request: Request, status_code: int, headers, body: bytes):
+    """Answer a matching If-None-Match/If-Modified-Since with 304, otherwise send the body."""
+    if status_code == 200 and "etag" in headers:
+        if is_not_modified(request.headers, headers["etag"], last_modified_timestamp(headers)):
+            return _not_modified_response(headers)
+    return await _buffered_response(request, status_code, headers, body)
+
+
+async def _proxy_cached(request: Request, route: str, target_url: str, headers):
+    """Serve a public page from the response cache, filling it on a miss.
+
+    HEAD is answered from the GET entry; uvicorn drops the body for HEAD.
+    Revalidations whose ETag is still current get a 304 without touching
+    the body cache or the upstream.
+    """
+    key = response_cache.key_for(route, request.url.query, request.headers)
+    if ETAGS_ENABLED and ("if-none-match" in request.headers or "if-modified-since" in request.headers):
+        known = etag_index.get(key)
+        if known is not None and is_not_modified(
+            request.headers, known["etag"], last_modified_timestamp(known)
+        ):
+            return _not_modified_response({**known, "x-proxy-cache": "HIT"})
+
+    entry = response_cache.get(key)
+    if entry is not None:
+        return await _conditional_response(
+            request, entry.status_code, {**entry.headers, "x-proxy-cache": "HIT"}, entry.body
+        )
+
+    # Ask for an identity body so the cached copy is encoding-neutral.
+    headers = {k: v for k, v in headers.items() if k.lower() not in ("accept-encoding", "content-length")}
+    headers["accept-encoding"] = "identity"
+
+    async def fetch():
+        started = time.perf_counter()
+        response, _ = await pool.hedged("GET", target_url, headers)
+        metrics.record_upstream(request, started)
+        resp_headers = _response_headers(response, BUFFERED_EXCLUDED_HEADERS)
+        if ETAGS_ENABLED and response_cache.is_storable(response.status_code, resp_headers):
+            previous = response_cache.get_stale(key)
+            resp_headers = tag_response(resp_headers, response.content, previous and previous.headers)
+            etag_index.remember(key, route, resp_headers)
+        response_cache.store(key, route, response.status_code, resp_headers, response.content)
+        return response.status_code, resp_headers, response.content
+
+    # Identical concurrent misses wait on one upstream render.
+    try:
+        status_code, resp_headers, body = await page_fetches.do(key, fetch)
+    except CircuitOpenError:
+        entry = response_cache.get_stale(key)
+        if entry is None:
+            raise
+        return await _conditional_response(
+            request, entry.status_code, {**entry.headers, "x-proxy-cache": "STALE"}, entry.body
+        )
+    return await _conditional_response(request, status_code, {**resp_headers, "x-proxy-cache": "MISS"}, body)
+
+
+async def _proxy_mutation(request: Request, route: str, target_url: str, headers):
+    """Forward an admin project mutation and invalidate the pages it touches.
+
+    The (possibly large multipart) request body is still streamed; only the
+    small JSON reply is buffered so the affected slug can be read from it.
+    """
+    content = _request_content(request, route)
+    started = time.perf_counter()
+    response = await pool.request(request.method, target_url, headers=headers, content=content)
+    metrics.record_upstream(request, started)
+
+    if 200 <= response.status_code < 300:
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = None
+        response_cache.invalidate_for_mutation(route, dict(request.query_params), payload)
+        catalog.apply_mutation(route, dict(request.query_params), payload)
+        project = payload.get("project") if isinstance(payload, dict) else None
+        if isinstance(project, dict):
+            pipeline.enqueue_project(project)
+
+    return await _buffered_response(
+        request,
+        response.status_code,
+        _response_headers(response, BUFFERED_EXCLUDED_HEADERS),
+        response.content,
     )
@@ -0,0 +1,33 @@
+"""Coalesce identical concurrent upstream fetches into a single call."""
+import asyncio
+
+
+class SingleFlight:
+    """Run at most one fetch per key at a time and share its result.
+
+    The fetch runs in its own task, so a caller that disconnects does not
+    cancel the work the other waiters depend on.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key, fetch):
+        task = self._calls.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fetch())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
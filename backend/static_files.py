@@ -0,0 +1,179 @@
+"""Serve Next.js build artifacts and public files without a Next.js round trip.
+
+``/_next/static/*`` comes from the build output directory, ``/favicon.ico``
+from app/ and anything else that exists under public/ from there. Files are
+sent with the ASGI zerocopy extension (sendfile) when the server offers it,
+support single ``Range`` requests and carry long-lived cache headers. A path
+that is not on disk falls through to Next.js.
+"""
+import mimetypes
+import os
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+
+import anyio
+from starlette.responses import Response
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NEXT_BUILD_DIR = os.environ.get("NEXT_BUILD_DIR", os.path.join(ROOT_DIR, ".next"))
+NEXT_PUBLIC_DIR = os.environ.get("NEXT_PUBLIC_DIR", os.path.join(ROOT_DIR, "public"))
+NEXT_APP_DIR = os.environ.get("NEXT_APP_DIR", os.path.join(ROOT_DIR, "app"))
+STATIC_ENABLED = os.environ.get("PROXY_STATIC_ENABLED", "true").lower() == "true"
+
+# Build artifacts have content hashes in their names.
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Public files keep their names across deploys, so they are revalidated.
+REVALIDATE = "public, max-age=3600, must-revalidate"
+
+CHUNK_SIZE = 64 * 1024
+
+for _type, _ext in (
+    ("application/javascript", ".js"),
+    ("application/json", ".map"),
+    ("font/woff2", ".woff2"),
+    ("font/woff", ".woff"),
+    ("image/webp", ".webp"),
+    ("image/avif", ".avif"),
+    ("image/svg+xml", ".svg"),
+    ("image/x-icon", ".ico"),
+):
+    mimetypes.add_type(_type, _ext)
+
+
+def _inside(root, relative):
+    root = os.path.realpath(root)
+    full = os.path.realpath(os.path.join(root, relative))
+    if full != root and not full.startswith(root + os.sep):
+        return None
+    return full
+
+
+def resolve(path):
+    """Map a request path to ``(file path, stat, cache-control)`` or None."""
+    if not STATIC_ENABLED:
+        return None
+    if path.startswith("/_next/static/"):
+        # Confined to static/: the rest of the build holds server bundles
+        # and the preview-mode keys.
+        root = os.path.join(NEXT_BUILD_DIR, "static")
+        full, cache_control = _inside(root, path[len("/_next/static/"):]), IMMUTABLE
+    elif path == "/favicon.ico":
+        full, cache_control = _inside(NEXT_APP_DIR, "favicon.ico"), REVALIDATE
+    elif path.startswith("/public/"):
+        full, cache_control = _inside(NEXT_PUBLIC_DIR, path[len("/public/"):]), REVALIDATE
+    elif "." in path.rsplit("/", 1)[-1] and not path.startswith(("/api/", "/_next/")):
+        # Next.js serves public/ at the site root, e.g. /next.svg.
+        full, cache_control = _inside(NEXT_PUBLIC_DIR, path[1:]), REVALIDATE
+    else:
+        return None
+    if full is None:
+        return None
+    try:
+        st = os.stat(full)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    return full, st, cache_control
+
+
+def parse_range(header, size):
+    """Parse a single ``bytes=`` range; returns (start, end) inclusive,
+    None to serve the whole file, or "unsatisfiable"."""
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None  # multipart/byteranges is not worth supporting here
+    first, _, last = spec.partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                return "unsatisfiable"
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return "unsatisfiable"
+    return start, min(end, size - 1)
+
+
+class StaticFileResponse(Response):
+    """File response with Range, conditional requests and zerocopy sending."""
+
+    def __init__(self, path, st, cache_control, request_headers, method="GET"):
+        self.path = path
+        self.send_body = method != "HEAD"
+        etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        headers = {
+            "cache-control": cache_control,
+            "etag": etag,
+            "last-modified": formatdate(st.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+        }
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.offset, self.count = 0, st.st_size
+        status_code = 200
+
+        if _not_modified(request_headers, etag, st.st_mtime):
+            status_code, self.count = 304, 0
+        else:
+            byte_range = parse_range(request_headers.get("range"), st.st_size)
+            if_range = request_headers.get("if-range")
+            if if_range and if_range != etag:
+                byte_range = None
+            if byte_range == "unsatisfiable":
+                status_code, self.count = 416, 0
+                headers["content-range"] = f"bytes */{st.st_size}"
+            elif byte_range is not None:
+                start, end = byte_range
+                status_code = 206
+                self.offset, self.count = start, end - start + 1
+                headers["content-range"] = f"bytes {start}-{end}/{st.st_size}"
+
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        if status_code != 304:
+            self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.count == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        if "http.response.zerocopy" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopy",
+                    "file": f.fileno(),
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            return
+        async with await anyio.open_file(self.path, "rb") as f:
+            await f.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b""})
+
+
+def _not_modified(request_headers, etag, mtime):
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match:
+        return etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*"
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
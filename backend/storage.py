@@ -0,0 +1,130 @@
+"""Minimal Supabase Storage client for the Python side of the backend.
+
+Talks to the Storage REST API directly with a pooled ``httpx.AsyncClient``,
+using the same environment variables as lib/supabaseServer.js.
+"""
+import logging
+import os
+import re
+from urllib.parse import quote, unquote
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_URL = os.environ.get("NEXT_PUBLIC_SUPABASE_URL", "https://placeholder.supabase.co").rstrip("/")
+SUPABASE_SERVICE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "placeholder-key")
+STORAGE_BUCKET = os.environ.get("SUPABASE_STORAGE_BUCKET", "projects")
+# Same placeholders as lib/supabaseServer.js. Nothing works against them:
+# uploads, /img and /api/projects (and so the public projects page) fail.
+_MISSING = [name for name in ("NEXT_PUBLIC_SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY") if not os.environ.get(name)]
+if _MISSING:
+    logger.warning(
+        "%s not set; using placeholder Supabase settings, so storage and /api/projects will fail",
+        " and ".join(_MISSING),
+    )
+
+STORAGE_MAX_CONNECTIONS = int(os.environ.get("STORAGE_POOL_MAX_CONNECTIONS", "20"))
+STORAGE_TIMEOUT = float(os.environ.get("STORAGE_TIMEOUT", "60"))
+
+
+class StorageError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        # HTTP status from Storage, when the request got that far.
+        self.status = status
+
+
+class SupabaseStorage:
+    def __init__(self, url=SUPABASE_URL, key=SUPABASE_SERVICE_KEY, bucket=STORAGE_BUCKET):
+        self.url = url
+        self.key = key
+        self.bucket = bucket
+        self.client = None
+        # Same pattern as extractStoragePath() in the Next.js routes.
+        self._public_path = re.compile(rf"/object/public/{re.escape(bucket)}/(.+)$")
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.key}", "apikey": self.key},
+                limits=httpx.Limits(max_connections=STORAGE_MAX_CONNECTIONS),
+                timeout=STORAGE_TIMEOUT,
+            )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def public_url(self, path):
+        return f"{self.url}/storage/v1/object/public/{self.bucket}/{quote(path)}"
+
+    def path_from_url(self, public_url):
+        match = self._public_path.search(public_url or "")
+        return unquote(match.group(1)) if match else None
+
+    async def upload(self, path, content, content_type, upsert=False, size=None):
+        """Upload ``content`` (bytes or an async iterator) and return its public URL.
+
+        Pass ``size`` with an iterator to send a Content-Length instead of a
+        chunked body.
+        """
+        headers = {"Content-Type": content_type, "x-upsert": "true" if upsert else "false"}
+        if size is not None:
+            headers["Content-Length"] = str(size)
+        response = await self.client.post(
+            f"{self.url}/storage/v1/object/{self.bucket}/{quote(path)}",
+            content=content,
+            headers=headers,
+        )
+        if response.status_code >= 400:
+            raise StorageError(f"Upload failed for {path}: {_error_message(response)}")
+        return self.public_url(path)
+
+    async def exists(self, path):
+        """True if the object is still in the bucket (a HEAD on its public URL)."""
+        if not path:
+            return False
+        response = await self.client.head(self.public_url(path))
+        return response.status_code == 200
+
+    async def list(self, prefix="", limit=100, offset=0):
+        """One page of the entries directly under ``prefix``.
+
+        Folders come back with ``id`` set to None; objects carry ``metadata``
+        with their ``size``.
+        """
+        response = await self.client.post(
+            f"{self.url}/storage/v1/object/list/{self.bucket}",
+            json={"prefix": prefix, "limit": limit, "offset": offset, "sortBy": {"column": "name", "order": "asc"}},
+        )
+        if response.status_code >= 400:
+            raise StorageError(f"List failed for {prefix or '/'}: {_error_message(response)}")
+        return response.json()
+
+    async def remove(self, paths):
+        """Delete objects by path; returns the entries storage reports as removed."""
+        response = await self.client.request(
+            "DELETE", f"{self.url}/storage/v1/object/{self.bucket}", json={"prefixes": list(paths)},
+        )
+        if response.status_code >= 400:
+            raise StorageError(f"Delete failed: {_error_message(response)}")
+        return response.json()
+
+    async def download(self, url):
+        response = await self.client.get(url)
+        if response.status_code >= 400:
+            raise StorageError(f"Download failed for {url}: HTTP {response.status_code}", response.status_code)
+        return response.content
+
+
+def _error_message(response):
+    try:
+        payload = response.json()
+    except ValueError:
+        return f"HTTP {response.status_code}"
+    return payload.get("message") or payload.get("error") or f"HTTP {response.status_code}"
+
+
+storage = SupabaseStorage()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Find and delete storage objects that no project references.
+
+Failed or abandoned creates, and batch or resumable uploads whose project
+was never saved, leave files under ``covers/<slug>/`` and
+``gallery/<slug>/``. This lists those folders in pages, compares every
+object with the ``cover_image_url`` and ``gallery`` entries of the projects
+table (image variants are kept with their original) and deletes the rest in
+concurrent batches, reporting the bytes reclaimed.
+
+Run from backend/ with the same environment as the proxy:
+
+    python storage_sweep.py --dry-run
+    python storage_sweep.py --min-age-hours 48
+
+Memory holds the referenced paths, one folder's listing and the batches in
+flight, never the whole bucket. Objects younger than ``--min-age-hours`` are
+left alone: they may belong to a project that is still being saved.
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from datetime import datetime
+
+from images import VARIANT_WIDTHS
+from storage import StorageError, storage
+from supabase_rest import RestError, rest
+from uploads import UPLOAD_FOLDERS
+
+LIST_PAGE_SIZE = 1000
+MAX_REPORTED_ERRORS = 20
+
+# covers/slug/123-photo.card.webp belongs to covers/slug/123-photo.<ext>
+_VARIANT_SUFFIX = re.compile(rf"\.(?:{'|'.join(VARIANT_WIDTHS)})\.[a-z0-9]+$")
+
+
+def _stem(path):
+    return path.rpartition(".")[0] or path
+
+
+class References:
+    """Storage paths used by projects, plus their stems for matching variants."""
+
+    def __init__(self):
+        self.paths = set()
+        self.stems = set()
+
+    def add(self, url):
+        path = storage.path_from_url(url) if isinstance(url, str) else None
+        if path:
+            self.paths.add(path)
+            self.stems.add(_stem(path))
+
+    def __contains__(self, path):
+        if path in self.paths:
+            return True
+        match = _VARIANT_SUFFIX.search(path)
+        return match is not None and path[:match.start()] in self.stems
+
+    def __len__(self):
+        return len(self.paths)
+
+
+async def load_references(page_size):
+    references = References()
+    projects = 0
+    # Paged by id, not offset: a project deleted mid-read would otherwise
+    # shift the next page and hide a live project, whose files then look
+    # orphaned.
+    async for rows in rest.select_pages_by_key("projects", "id,cover_image_url,gallery", page_size=page_size):
+        for row in rows:
+            projects += 1
+            references.add(row.get("cover_image_url"))
+            for url in row.get("gallery") or ():
+                references.add(url)
+    return references, projects
+
+
+async def _list_folder(prefix, page_size):
+    offset = 0
+    while True:
+        page = await storage.list(prefix, page_size, offset)
+        for entry in page:
+            yield entry
+        if len(page) < page_size:
+            return
+        offset += page_size
+
+
+async def walk(prefix, page_size=LIST_PAGE_SIZE):
+    """Yield ``(path, entry)`` lists, one per folder under ``prefix``.
+
+    Listing pages by offset, so a folder is listed completely before any of
+    its objects can be deleted; deleting mid-listing would shift later pages
+    and skip objects.
+    """
+    objects, folders = [], []
+    async for entry in _list_folder(prefix, page_size):
+        path = f"{prefix}/{entry['name']}"
+        if entry.get("id") is None:
+            folders.append(path)
+        else:
+            objects.append((path, entry))
+    if objects:
+        yield objects
+    for folder in folders:
+        async for listing in walk(folder, page_size):
+            yield listing
+
+
+def _created_at(entry):
+    try:
+        return datetime.fromisoformat(entry["created_at"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, ValueError):
+        return None
+
+
+class Sweep:
+    def __init__(self, references, min_age, dry_run=True, batch_size=100, concurrency=4, verbose=False):
+        self.references = references
+        self.cutoff = time.time() - min_age
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.verbose = verbose
+        self._batch = []
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+        self.scanned = self.scanned_bytes = 0
+        self.kept = self.recent = 0
+        self.orphans = self.orphan_bytes = 0
+        self.deleted = self.reclaimed_bytes = 0
+        self.failed = 0
+        self.errors = []
+
+    async def visit(self, path, entry):
+        size = (entry.get("metadata") or {}).get("size") or 0
+        self.scanned += 1
+        self.scanned_bytes += size
+        if path in self.references:
+            self.kept += 1
+            return
+        created = _created_at(entry)
+        if created is None or created > self.cutoff:
+            # Unknown age counts as new: never delete what cannot be dated.
+            self.recent += 1
+            return
+        self.orphans += 1
+        self.orphan_bytes += size
+        if self.verbose:
+            print(path, file=sys.stderr)
+        self._batch.append((path, size))
+        if len(self._batch) >= self.batch_size:
+            await self._flush()
+
+    async def _flush(self):
+        batch, self._batch = self._batch, []
+        if self.dry_run or not batch:
+            return
+        # Waiting for a slot here is what bounds the batches held in memory.
+        await self._slots.acquire()
+        task = asyncio.create_task(self._delete(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _delete(self, batch):
+        sizes = dict(batch)
+        try:
+            removed = {entry.get("name") for entry in await storage.remove(sizes)}
+        except (StorageError, ValueError) as e:
+            self.failed += len(batch)
+            self._error(str(e))
+            return
+        finally:
+            self._slots.release()
+        for path, size in sizes.items():
+            if path in removed:
+                self.deleted += 1
+                self.reclaimed_bytes += size
+            else:
+                self.failed += 1
+                self._error(f"Not removed: {path}")
+
+    def _error(self, message):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    async def finish(self):
+        await self._flush()
+        await asyncio.gather(*self._tasks)
+
+    def report(self):
+        return {
+            "dry_run": self.dry_run,
+            "scanned": {"objects": self.scanned, "bytes": self.scanned_bytes},
+            "referenced": self.kept,
+            "skipped_recent": self.recent,
+            "orphans": {"objects": self.orphans, "bytes": self.orphan_bytes},
+            "deleted": {"objects": self.deleted, "bytes": self.reclaimed_bytes},
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+async def run(args):
+    await storage.start()
+    await rest.start()
+    started = time.perf_counter()
+    try:
+        references, projects = await load_references(args.page_size)
+        if not projects and not args.allow_empty:
+            raise RestError("The projects table is empty; pass --allow-empty to sweep every object")
+        sweep = Sweep(
+            references, args.min_age_hours * 3600, dry_run=args.dry_run,
+            batch_size=args.batch_size, concurrency=args.concurrency, verbose=args.verbose,
+        )
+        for folder in sorted(UPLOAD_FOLDERS):
+            async for listing in walk(folder, args.page_size):
+                for path, entry in listing:
+                    await sweep.visit(path, entry)
+        await sweep.finish()
+    finally:
+        await rest.close()
+        await storage.close()
+    return {
+        "bucket": storage.bucket,
+        "projects": projects,
+        "referenced_paths": len(references),
+        **sweep.report(),
+        "elapsed_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="report orphans without deleting them")
+    parser.add_argument("--min-age-hours", type=float, default=24.0, help="only delete objects older than this (default 24)")
+    parser.add_argument("--batch-size", type=int, default=100, help="objects per delete request (default 100)")
+    parser.add_argument("--concurrency", type=int, default=4, help="delete requests in flight (default 4)")
+    parser.add_argument("--page-size", type=int, default=LIST_PAGE_SIZE, help="rows or objects per listing page")
+    parser.add_argument("--allow-empty", action="store_true", help="sweep even if no projects exist")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print each orphan path to stderr")
+    args = parser.parse_args()
+
+    try:
+        result = asyncio.run(run(args))
+    except (RestError, StorageError) as e:
+        print(f"Sweep aborted: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps(result, indent=2))
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
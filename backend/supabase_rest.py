@@ -0,0 +1,93 @@
+"""Minimal Supabase PostgREST client for reads from the Python side.
+
+Uses the service role key from lib/supabaseServer.js over its own pooled
+``httpx.AsyncClient``; rows are fetched in pages so callers can stream
+large tables without holding them in memory.
+"""
+import os
+
+import httpx
+
+from storage import SUPABASE_SERVICE_KEY, SUPABASE_URL
+
+REST_MAX_CONNECTIONS = int(os.environ.get("SUPABASE_REST_MAX_CONNECTIONS", "10"))
+REST_TIMEOUT = float(os.environ.get("SUPABASE_REST_TIMEOUT", "30"))
+REST_PAGE_SIZE = int(os.environ.get("SUPABASE_REST_PAGE_SIZE", "500"))
+
+
+class RestError(Exception):
+    pass
+
+
+class SupabaseRest:
+    def __init__(self, url=SUPABASE_URL, key=SUPABASE_SERVICE_KEY):
+        self.url = url
+        self.key = key
+        self.client = None
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.key}", "apikey": self.key},
+                limits=httpx.Limits(max_connections=REST_MAX_CONNECTIONS),
+                timeout=REST_TIMEOUT,
+            )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def select_pages(self, table, columns="*", order=None, page_size=REST_PAGE_SIZE, **filters):
+        """Yield lists of rows, ``page_size`` at a time.
+
+        ``filters`` are PostgREST operators, e.g. ``category="eq.renovation"``.
+        """
+        params = {"select": columns, **filters}
+        if order:
+            params["order"] = order
+        offset = 0
+        while True:
+            response = await self.client.get(
+                f"{self.url}/rest/v1/{table}",
+                params={**params, "limit": page_size, "offset": offset},
+            )
+            if response.status_code >= 400:
+                raise RestError(f"Select from {table} failed: HTTP {response.status_code}")
+            rows = response.json()
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            offset += page_size
+
+    async def select_pages_by_key(self, table, columns="*", key="id", page_size=REST_PAGE_SIZE, **filters):
+        """Like ``select_pages``, but each page starts after the last ``key`` seen.
+
+        Rows inserted or deleted while paging cannot shift a later page, so
+        no row that exists throughout is skipped. ``columns`` must include
+        ``key``.
+        """
+        last = None
+        while True:
+            params = {"select": columns, **filters, "order": f"{key}.asc", "limit": page_size}
+            if last is not None:
+                params[key] = f"gt.{last}"
+            response = await self.client.get(f"{self.url}/rest/v1/{table}", params=params)
+            if response.status_code >= 400:
+                raise RestError(f"Select from {table} failed: HTTP {response.status_code}")
+            rows = response.json()
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            last = rows[-1][key]
+
+    async def select(self, table, columns="*", order=None, **filters):
+        rows = []
+        async for page in self.select_pages(table, columns, order, **filters):
+            rows.extend(page)
+        return rows
+
+
+rest = SupabaseRest()
@@ -0,0 +1,218 @@
+"""Server-Timing headers and a sampling profiler for slow requests.
+
+Handlers note phase durations on the request; ``TimingMiddleware`` adds
+them as a ``Server-Timing`` header when the response starts. Time spent
+writing the body happens after the headers are sent, so it only shows up in
+the profiler and the request duration metric.
+
+The profiler is off unless ``PROXY_PROFILE_SAMPLE_RATE`` is above zero (it
+can also be switched on at runtime through /api/proxy/profiler). For a
+sampled request a background thread records the event loop thread's Python
+stack every few milliseconds. Requests that end above the latency threshold
+have their samples written, in collapsed-stack format for flame graph
+tools, to a directory that keeps only the newest files. The samples show
+everything the event loop ran during the request, which is what a slow
+request waits behind.
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import metrics
+
+PROFILE_DIR = os.environ.get("PROXY_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "invera-profiles"))
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROXY_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_THRESHOLD_MS = float(os.environ.get("PROXY_PROFILE_THRESHOLD_MS", "1000"))
+PROFILE_INTERVAL_MS = float(os.environ.get("PROXY_PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_FILES = int(os.environ.get("PROXY_PROFILE_MAX_FILES", "50"))
+MAX_STACK_DEPTH = 64
+
+
+def record(request, name, seconds):
+    """Add a phase to the request's Server-Timing header."""
+    request.scope.setdefault("state", {}).setdefault("timings", []).append((name, seconds))
+
+
+@contextmanager
+def phase(request, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(request, name, time.perf_counter() - started)
+
+
+def server_timing(phases):
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases)
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Capture:
+    __slots__ = ("samples",)
+
+    def __init__(self):
+        self.samples = Counter()
+
+
+class SlowRequestProfiler:
+    def __init__(self, directory=PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE, threshold_ms=PROFILE_THRESHOLD_MS,
+                 interval_ms=PROFILE_INTERVAL_MS, max_files=PROFILE_MAX_FILES):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.threshold_ms = threshold_ms
+        self.interval_ms = interval_ms
+        self.max_files = max_files
+        self._captures = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._target = None
+        self.sampled = 0
+        self.written = 0
+
+    def configure(self, sample_rate=None, threshold_ms=None):
+        if sample_rate is not None:
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        if threshold_ms is not None:
+            self.threshold_ms = max(threshold_ms, 0.0)
+
+    def begin(self):
+        """Start capturing for this request if it is sampled; returns a capture or None."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        capture = Capture()
+        with self._lock:
+            self._captures.add(capture)
+            self._target = threading.get_ident()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+        self.sampled += 1
+        return capture
+
+    async def end(self, capture, duration, method, route, status):
+        with self._lock:
+            self._captures.discard(capture)
+        if duration * 1000 < self.threshold_ms or not capture.samples:
+            return
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{method}-{_safe(route)}-{status}-{int(duration * 1000)}ms.folded"
+        await asyncio.to_thread(self._write, name, capture.samples)
+
+    def _run(self):
+        interval = self.interval_ms / 1000
+        while True:
+            with self._lock:
+                if not self._captures:
+                    self._thread = None
+                    return
+                captures = list(self._captures)
+                target = self._target
+            frame = sys._current_frames().get(target)
+            if frame is not None:
+                stack = _collapse(frame)
+                for capture in captures:
+                    capture.samples[stack] += 1
+            del frame
+            time.sleep(interval)
+
+    def _write(self, name, samples):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = os.path.join(self.directory, f".tmp-{name}")
+        with open(tmp, "w") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp, os.path.join(self.directory, name))
+        self.written += 1
+        self._rotate()
+
+    def _rotate(self):
+        files = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".folded")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def profiles(self):
+        try:
+            entries = [e for e in os.scandir(self.directory) if e.name.endswith(".folded")]
+        except FileNotFoundError:
+            return []
+        return sorted((e.name for e in entries), reverse=True)
+
+    def stats(self):
+        return {
+            "sample_rate": self.sample_rate,
+            "threshold_ms": self.threshold_ms,
+            "interval_ms": self.interval_ms,
+            "directory": self.directory,
+            "max_files": self.max_files,
+            "active_captures": len(self._captures),
+            "sampled": self.sampled,
+            "written": self.written,
+        }
+
+
+def _safe(route):
+    return "".join(c if c.isalnum() else "_" for c in route).strip("_") or "root"
+
+
+profiler = SlowRequestProfiler()
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware adding ``Server-Timing`` and driving the profiler."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        state = scope.setdefault("state", {})
+        started = time.perf_counter()
+        status = {"code": 500}
+        capture = profiler.begin()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                phases = []
+                if "queue_seconds" in state:
+                    phases.append(("queue", state["queue_seconds"]))
+                phases += state.get("timings", [])
+                if "upstream_seconds" in state:
+                    phases.append(("upstream", state["upstream_seconds"]))
+                phases.append(("app", time.perf_counter() - started))
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (b"server-timing", server_timing(phases).encode())],
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if capture is not None:
+                await profiler.end(
+                    capture, time.perf_counter() - started, scope["method"],
+                    metrics.normalize_route(scope["path"]), status["code"],
+                )
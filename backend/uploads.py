@@ -0,0 +1,100 @@
+"""Concurrent batch uploads of project images to Supabase Storage.
+
+The Next.js routes upload a gallery one file at a time. Here every file of a
+batch is validated up front and, if all are valid, uploaded concurrently
+through the pooled storage client, bounded by a semaphore, so a whole
+gallery takes roughly as long as its slowest image. When the batch is for an
+existing project, files whose content is already stored for it reuse its URL
+(see dedup.py).
+"""
+import asyncio
+import os
+import re
+import time
+
+from dedup import content_index, hash_upload_file, iter_upload_file
+from multipart_validation import ALLOWED_TYPES, MAX_FILE_SIZE, sniff_image_type
+from storage import StorageError, storage
+
+UPLOAD_CONCURRENCY = int(os.environ.get("STORAGE_UPLOAD_CONCURRENCY", "6"))
+BATCH_MAX_FILES = int(os.environ.get("STORAGE_BATCH_MAX_FILES", "50"))
+UPLOAD_FOLDERS = {"covers", "gallery"}
+
+
+def sanitize_file_name(name):
+    """Same rules as sanitizeFileName() in the Next.js routes."""
+    return re.sub(r"[^a-zA-Z0-9._-]", "_", name or "file")
+
+
+def validate_file(name, content_type, size, head):
+    """Return the Next.js validateFile() message for a bad file, else None."""
+    if content_type not in ALLOWED_TYPES or sniff_image_type(head) is None:
+        return f"Invalid file type: {name}. Only JPEG, PNG, and WebP are allowed."
+    if size > MAX_FILE_SIZE:
+        return f"File too large: {name}. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)}MB."
+    return None
+
+
+class BatchUploader:
+    def __init__(self, concurrency=UPLOAD_CONCURRENCY):
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.uploaded = 0
+        self.failed = 0
+
+    async def upload_one(self, file, folder, project_id, path, digest):
+        """Stream a Starlette ``UploadFile`` to storage once a slot is free.
+
+        ``digest`` is its SHA-256; content already stored for project
+        ``project_id`` is not uploaded again.
+        """
+        async with self._semaphore:
+            size = file.size or 0
+
+            def put():
+                return storage.upload(path, iter_upload_file(file), file.content_type, size=size)
+
+            return await content_index.store(folder, project_id, digest, size, put)
+
+    async def upload(self, files, folder, slug, project_id=None):
+        """Upload ``files`` in order; returns one ``{"name", "url", "error"}`` per file.
+
+        Every file is validated before anything is uploaded. If one is
+        invalid the batch is rejected whole, as the Next.js routes do, and
+        nothing is stored; only storage failures leave a partial batch.
+        """
+        batch = int(time.time() * 1000)
+        results = []
+        digests = []
+        for file in files:
+            # The read that checks the file type also hashes it for dedup.
+            digest, head = await hash_upload_file(file)
+            error = validate_file(file.filename, file.content_type, file.size or 0, head)
+            results.append({"name": file.filename, "url": None, "error": error})
+            digests.append(digest)
+        if any(result["error"] for result in results):
+            self.failed += len(results)
+            return results
+
+        # The index keeps same-named files in one batch apart.
+        outcomes = await asyncio.gather(*(
+            self.upload_one(
+                file, folder, project_id, f"{folder}/{slug}/{batch}-{index}-{sanitize_file_name(file.filename)}", digest,
+            )
+            for index, (file, digest) in enumerate(zip(files, digests))
+        ), return_exceptions=True)
+        for result, outcome in zip(results, outcomes):
+            if isinstance(outcome, StorageError):
+                result["error"] = str(outcome)
+            elif isinstance(outcome, BaseException):
+                result["error"] = f"Upload failed for {result['name']}: {type(outcome).__name__}"
+            else:
+                result["url"] = outcome
+        for result in results:
+            if result["error"] is None:
+                self.uploaded += 1
+            else:
+                self.failed += 1
+        return results
+
+
+uploader = BatchUploader()
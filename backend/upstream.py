@@ -0,0 +1,462 @@
+"""Shared upstream HTTP client and load balancing for the Next.js proxy.
+
+One ``httpx.AsyncClient`` lives for the lifetime of the app so connections to
+Next.js are pooled and kept alive instead of being opened per request.
+Requests are spread over one or more Next.js instances (``NEXTJS_URLS``) by
+least outstanding requests or EWMA latency. Instances that fail passively
+(transport errors) or actively (health checks) leave the rotation until they
+recover.
+
+Idempotent GET/HEAD requests get tail-latency protection: if the first
+attempt is slower than the observed p95 a hedged duplicate is sent to another
+instance, when there is one, and the loser is cancelled, and a per-instance circuit breaker fails
+fast once an instance keeps timing out. Other methods are never retried.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+NEXTJS_URLS = [
+    url.strip().rstrip("/")
+    for url in (os.environ.get("NEXTJS_URLS") or os.environ.get("NEXTJS_URL", "http://localhost:3000")).split(",")
+    if url.strip()
+]
+
+POOL_MAX_CONNECTIONS = int(os.environ.get("PROXY_POOL_MAX_CONNECTIONS", "100"))
+POOL_MAX_KEEPALIVE = int(os.environ.get("PROXY_POOL_MAX_KEEPALIVE", "20"))
+POOL_KEEPALIVE_EXPIRY = float(os.environ.get("PROXY_POOL_KEEPALIVE_EXPIRY", "30"))
+POOL_ACQUIRE_TIMEOUT = float(os.environ.get("PROXY_POOL_ACQUIRE_TIMEOUT", "10"))
+UPSTREAM_TIMEOUT = float(os.environ.get("PROXY_UPSTREAM_TIMEOUT", "120"))
+UPSTREAM_HTTP2 = os.environ.get("PROXY_UPSTREAM_HTTP2", "false").lower() == "true"
+
+# "least_outstanding" or "ewma"
+BALANCE_STRATEGY = os.environ.get("UPSTREAM_BALANCE", "least_outstanding")
+EWMA_ALPHA = 0.3
+HEALTH_CHECK_PATH = os.environ.get("UPSTREAM_HEALTH_PATH", "/favicon.ico")
+HEALTH_CHECK_INTERVAL = float(os.environ.get("UPSTREAM_HEALTH_INTERVAL", "5"))
+HEALTH_CHECK_TIMEOUT = float(os.environ.get("UPSTREAM_HEALTH_TIMEOUT", "2"))
+UNHEALTHY_THRESHOLD = int(os.environ.get("UPSTREAM_UNHEALTHY_THRESHOLD", "3"))
+# How long an ejected instance stays out before it is tried again even
+# without a passing health check.
+EJECT_COOLDOWN = float(os.environ.get("UPSTREAM_EJECT_COOLDOWN", "30"))
+
+HEDGE_ENABLED = os.environ.get("PROXY_HEDGE_ENABLED", "true").lower() == "true"
+HEDGE_DEFAULT_DELAY = float(os.environ.get("PROXY_HEDGE_DEFAULT_DELAY", "1.0"))
+HEDGE_MIN_DELAY = float(os.environ.get("PROXY_HEDGE_MIN_DELAY", "0.05"))
+HEDGE_MAX_DELAY = float(os.environ.get("PROXY_HEDGE_MAX_DELAY", "10"))
+# Hedges may add at most this fraction of extra upstream GETs.
+HEDGE_BUDGET = float(os.environ.get("PROXY_HEDGE_BUDGET", "0.1"))
+IDEMPOTENT_TIMEOUT = float(os.environ.get("PROXY_GET_TIMEOUT", "30"))
+BREAKER_THRESHOLD = int(os.environ.get("UPSTREAM_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET = float(os.environ.get("UPSTREAM_BREAKER_RESET", "15"))
+
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+
+
+class CircuitOpenError(Exception):
+    """Every upstream instance has an open circuit breaker."""
+
+    def __init__(self, retry_after):
+        super().__init__("All upstreams are failing fast")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """closed -> open after repeated timeouts -> half-open single probe -> closed."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_after=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.timeouts = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened_total = 0
+
+    def can_attempt(self, now):
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return now >= self.opened_at + self.reset_after
+        return not self.probing
+
+    def on_attempt(self, now):
+        if self.state == "open" and now >= self.opened_at + self.reset_after:
+            self.state = "half_open"
+        if self.state == "half_open":
+            self.probing = True
+
+    def on_success(self):
+        self.state = "closed"
+        self.timeouts = 0
+        self.probing = False
+
+    def on_timeout(self):
+        self.timeouts += 1
+        self.probing = False
+        if self.state == "half_open" or self.timeouts >= self.threshold:
+            if self.state != "open":
+                self.opened_total += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def on_abandoned(self):
+        self.probing = False
+
+    def retry_after(self, now):
+        return max(0.0, self.opened_at + self.reset_after - now)
+
+
+class LatencyTracker:
+    """Rolling p95 of upstream GET time-to-headers, used as the hedge delay."""
+
+    def __init__(self, size=1000, recompute_every=50):
+        self.samples = deque(maxlen=size)
+        self.recompute_every = recompute_every
+        self._since = 0
+        self.p95 = None
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self._since += 1
+        if self._since >= self.recompute_every:
+            self._since = 0
+            ordered = sorted(self.samples)
+            self.p95 = ordered[int(len(ordered) * 0.95) - 1 if len(ordered) > 1 else 0]
+
+    def hedge_delay(self):
+        if self.p95 is None:
+            return HEDGE_DEFAULT_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, self.p95))
+
+
+class Upstream:
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.ewma = 0.0
+        self.healthy = True
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests_total = 0
+        self.failures_total = 0
+        self.breaker = CircuitBreaker()
+
+    def available(self, now):
+        return self.healthy or now >= self.ejected_until
+
+    def record_latency(self, seconds):
+        self.ewma = seconds if self.ewma == 0.0 else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.ewma
+
+    def record_success(self):
+        if not self.healthy:
+            logger.info("Upstream %s is healthy again", self.url)
+        self.failures = 0
+        self.healthy = True
+
+    def record_failure(self):
+        self.failures += 1
+        self.failures_total += 1
+        if self.failures >= UNHEALTHY_THRESHOLD:
+            if self.healthy:
+                logger.warning("Upstream %s taken out of rotation after %d failures", self.url, self.failures)
+            self.healthy = False
+            self.ejected_until = time.monotonic() + EJECT_COOLDOWN
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "ewma_ms": round(self.ewma * 1000, 3),
+            "requests_total": self.requests_total,
+            "failures_total": self.failures_total,
+            "breaker": self.breaker.state,
+            "breaker_opened_total": self.breaker.opened_total,
+        }
+
+
+class Lease:
+    """One request's claim on an upstream instance and a pooled connection."""
+
+    def __init__(self, client, upstream):
+        self.client = client
+        self.upstream = upstream
+        self.started = time.perf_counter()
+        self.latency = None
+
+    def url(self, target):
+        return f"{self.upstream.url}{target}"
+
+    def mark(self):
+        """Record time-to-headers; call once the upstream has answered."""
+        if self.latency is None:
+            self.latency = time.perf_counter() - self.started
+            self.upstream.record_latency(self.latency)
+
+    async def request(self, method, target, **kwargs):
+        response = await self.client.request(method, self.url(target), **kwargs)
+        self.mark()
+        return response
+
+
+class UpstreamPool:
+    """Owns the pooled client, the upstream instances and their health."""
+
+    def __init__(
+        self,
+        urls=NEXTJS_URLS,
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        http2=UPSTREAM_HTTP2,
+        strategy=BALANCE_STRATEGY,
+    ):
+        self.upstreams = [Upstream(url) for url in urls]
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.strategy = strategy
+        self.http2_active = False
+        self.client = None
+        self._health_task = None
+        self.latency = LatencyTracker()
+        self.hedges_total = 0
+        self.hedge_wins_total = 0
+        self.idempotent_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated_total = 0
+        self.pool_timeouts_total = 0
+        self.requests_total = 0
+
+    async def start(self):
+        if self.client is not None:
+            return
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("PROXY_UPSTREAM_HTTP2 is set but the 'h2' package is missing; using HTTP/1.1")
+            http2 = False
+        self.http2_active = http2
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(UPSTREAM_TIMEOUT, pool=POOL_ACQUIRE_TIMEOUT),
+        )
+        if HEALTH_CHECK_INTERVAL > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    @asynccontextmanager
+    async def track(self):
+        """Count a request against the pool while it holds (or waits for) a connection."""
+        self.requests_total += 1
+        if self.in_flight >= self.max_connections:
+            self.saturated_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            yield self.client
+        except httpx.PoolTimeout:
+            self.pool_timeouts_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def pick(self, exclude=None):
+        """Choose the instance for the next request.
+
+        With ``exclude`` (the instance a hedge would duplicate) returns None
+        when no other instance can take the request.
+        """
+        now = time.monotonic()
+        allowed = [u for u in self.upstreams if u.breaker.can_attempt(now)]
+        if not allowed:
+            raise CircuitOpenError(min(u.breaker.retry_after(now) for u in self.upstreams))
+        candidates = [u for u in allowed if u.available(now)] or allowed
+        if exclude is not None:
+            candidates = [u for u in candidates if u is not exclude]
+            if not candidates:
+                return None
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.strategy == "ewma":
+            def score(u):
+                return (u.outstanding + 1) * (u.ewma or 1e-3)
+        else:
+            def score(u):
+                return (u.outstanding, u.ewma)
+        best = min(score(u) for u in candidates)
+        return random.choice([u for u in candidates if score(u) == best])
+
+    @asynccontextmanager
+    async def lease(self, upstream=None):
+        """Pick an upstream and hold a pooled connection for one request.
+
+        Transport errors count against the instance's health and timeouts
+        against its circuit breaker; the lease is released when the block
+        exits (after the body for streamed replies).
+        """
+        if upstream is None:
+            upstream = self.pick()
+        upstream.breaker.on_attempt(time.monotonic())
+        upstream.outstanding += 1
+        upstream.requests_total += 1
+        try:
+            async with self.track() as client:
+                lease = Lease(client, upstream)
+                yield lease
+                lease.mark()
+            upstream.record_success()
+            upstream.breaker.on_success()
+        except httpx.TimeoutException:
+            upstream.record_failure()
+            upstream.breaker.on_timeout()
+            raise
+        except httpx.TransportError:
+            upstream.record_failure()
+            raise
+        finally:
+            upstream.breaker.on_abandoned()
+            upstream.outstanding -= 1
+
+    async def request(self, method, target, **kwargs):
+        """Send a buffered request to the best upstream and return the response."""
+        async with self.lease() as lease:
+            return await lease.request(method, target, **kwargs)
+
+    async def _attempt(self, method, target, headers, stream, upstream):
+        """One try of an idempotent request: returns (response, exit stack).
+
+        The stack releases the response and the lease; for buffered attempts
+        it has already been closed.
+        """
+        stack = AsyncExitStack()
+        try:
+            lease = await stack.enter_async_context(self.lease(upstream=upstream))
+            upstream_request = lease.client.build_request(
+                method, lease.url(target), headers=headers, timeout=IDEMPOTENT_TIMEOUT
+            )
+            response = await lease.client.send(upstream_request, stream=True)
+            lease.mark()
+            self.latency.add(lease.latency)
+            stack.push_async_callback(response.aclose)
+            if not stream:
+                await response.aread()
+                await stack.aclose()
+            return response, stack
+        except BaseException as exc:
+            # Let the lease see the error so it counts against the instance.
+            await stack.__aexit__(type(exc), exc, exc.__traceback__)
+            raise
+
+    def _hedge_allowed(self):
+        return HEDGE_ENABLED and self.hedges_total < HEDGE_BUDGET * self.idempotent_total + 1
+
+    async def hedged(self, method, target, headers, stream=False):
+        """Send a GET/HEAD, hedging it on another instance if it is slow.
+
+        Returns ``(response, release)`` where ``release`` is an async callable
+        that must be awaited once a streamed body has been consumed.
+        """
+        assert method in IDEMPOTENT_METHODS, "only idempotent requests may be hedged"
+        self.idempotent_total += 1
+        first_upstream = self.pick()
+        first = asyncio.ensure_future(self._attempt(method, target, headers, stream, first_upstream))
+        tasks = [first]
+        winner = None
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=self.latency.hedge_delay())
+            if not done and self._hedge_allowed():
+                try:
+                    hedge_upstream = self.pick(exclude=first_upstream)
+                except CircuitOpenError:
+                    hedge_upstream = None
+                if hedge_upstream is not None:
+                    self.hedges_total += 1
+                    tasks.append(asyncio.ensure_future(self._attempt(method, target, headers, stream, hedge_upstream)))
+                    pending = set(tasks)
+            while winner is None:
+                if not done:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                task = done.pop()
+                # Prefer a success; an error only wins once nothing is left.
+                if task.exception() is None or (not done and not pending):
+                    winner = task
+        finally:
+            for task in tasks:
+                if task is not winner:
+                    task.cancel()
+            for task in tasks:
+                if task is winner:
+                    continue
+                try:
+                    _, stack = await task
+                except BaseException:
+                    continue
+                await stack.aclose()
+
+        response, stack = winner.result()
+        if winner is not first:
+            self.hedge_wins_total += 1
+        return response, stack.aclose
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.gather(*(self._check(u) for u in self.upstreams))
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+    async def _check(self, upstream):
+        try:
+            response = await self.client.get(f"{upstream.url}{HEALTH_CHECK_PATH}", timeout=HEALTH_CHECK_TIMEOUT)
+        except httpx.HTTPError:
+            upstream.record_failure()
+            return
+        if response.status_code < 500:
+            upstream.record_success()
+        else:
+            upstream.record_failure()
+
+    def stats(self):
+        return {
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive,
+            "keepalive_expiry": self.keepalive_expiry,
+            "http2": self.http2_active,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "utilization": self.in_flight / self.max_connections if self.max_connections else 0.0,
+            "saturated_total": self.saturated_total,
+            "pool_timeouts_total": self.pool_timeouts_total,
+            "requests_total": self.requests_total,
+            "strategy": self.strategy,
+            "hedge_delay": self.latency.hedge_delay(),
+            "hedges_total": self.hedges_total,
+            "hedge_wins_total": self.hedge_wins_total,
+            "upstreams": [u.stats() for u in self.upstreams],
+        }
+
+
+pool = UpstreamPool()
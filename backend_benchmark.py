@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Async load generation and latency benchmark for the backend proxy.
+
+Drives a configurable mix of page GETs, project slug lookups and multipart
+project creates (the same requests as backend_test.py and
+backend_file_upload_test.py) at a fixed concurrency or request rate, and
+prints p50/p95/p99 latency, throughput and error rates as JSON.
+
+By default it runs fully offline: backend/server.py is started in-process
+against stub_upstream.py standing in for Next.js and Supabase. Pass
+--base-url to benchmark an already running deployment instead.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+from stub_upstream import admin_login, create_stub_app, offline_proxy
+
+PAGE_PATHS = ['/', '/about', '/projects']
+DEFAULT_MIX = 'page=6,slug=3,create=1'
+
+
+def create_test_image(format='JPEG', size=(200, 200)):
+    """Same image as FileUploadAPITester.create_test_image"""
+    from PIL import Image as PILImage
+
+    img = PILImage.new('RGB', size, color='red')
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format=format)
+    return img_bytes.getvalue()
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(SCENARIOS)
+    if unknown:
+        raise ValueError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadContext:
+    def __init__(self, client, slugs, rng, admin):
+        self.client = client
+        self.slugs = slugs
+        self.rng = rng
+        self.admin = admin
+        # Encoded once and reused for every create.
+        self.cover = create_test_image()
+        self.gallery = create_test_image(size=(150, 150))
+
+
+async def scenario_page(ctx):
+    return await ctx.client.get(ctx.rng.choice(PAGE_PATHS)), 200
+
+
+async def scenario_slug(ctx):
+    slug = ctx.rng.choice(ctx.slugs) if ctx.slugs else 'missing-project'
+    return await ctx.client.get(f'/projects/{slug}'), 200
+
+
+async def scenario_create(ctx):
+    data = {
+        'name': f'Benchmark Project {datetime.now().strftime("%H%M%S%f")}',
+        'category': 'architecture',
+        'location': 'Test Location',
+        'year': '2024',
+        'summary': 'Benchmark summary',
+    }
+    files = [
+        ('cover_image', ('cover.jpg', ctx.cover, 'image/jpeg')),
+        ('gallery_images', ('gallery1.jpg', ctx.gallery, 'image/jpeg')),
+    ]
+    response = await ctx.client.post('/api/admin/projects/create', data=data, files=files, cookies=ctx.admin)
+    return response, 200
+
+
+SCENARIOS = {
+    'page': scenario_page,
+    'slug': scenario_slug,
+    'create': scenario_create,
+}
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+
+    def record(self, scenario, latency, ok, status):
+        self.latencies.setdefault(scenario, []).append(latency)
+        if not ok:
+            self.errors[scenario] = self.errors.get(scenario, 0) + 1
+        key = f'{scenario}:{status}'
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+    def summary(self, elapsed):
+        def describe(latencies, errors):
+            values = sorted(latencies)
+            return {
+                'requests': len(values),
+                'errors': errors,
+                'error_rate': errors / len(values) if values else 0.0,
+                'throughput_rps': len(values) / elapsed if elapsed else 0.0,
+                'latency_ms': {
+                    'p50': _ms(percentile(values, 50)),
+                    'p95': _ms(percentile(values, 95)),
+                    'p99': _ms(percentile(values, 99)),
+                    'max': _ms(values[-1] if values else None),
+                    'mean': _ms(sum(values) / len(values) if values else None),
+                },
+            }
+
+        everything = [v for values in self.latencies.values() for v in values]
+        return {
+            'elapsed_s': round(elapsed, 3),
+            'overall': describe(everything, sum(self.errors.values())),
+            'scenarios': {
+                name: describe(values, self.errors.get(name, 0))
+                for name, values in sorted(self.latencies.items())
+            },
+            'statuses': dict(sorted(self.statuses.items())),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+async def _issue(ctx, recorder, scenario, scheduled):
+    """Run one request; latency is measured from its scheduled start so an
+    overloaded server cannot hide queueing delay (coordinated omission)."""
+    try:
+        response, expected = await SCENARIOS[scenario](ctx)
+        ok, status = response.status_code == expected, response.status_code
+    except httpx.HTTPError as e:
+        ok, status = False, type(e).__name__
+    recorder.record(scenario, time.perf_counter() - scheduled, ok, status)
+
+
+async def run_load(base_url, duration, concurrency, rate, mix, seed=None, slugs=(), password=''):
+    rng = random.Random(seed)
+    names, weights = zip(*mix.items())
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        admin = await admin_login(client, password) if 'create' in mix else {}
+        ctx = LoadContext(client, list(slugs), rng, admin)
+        started = time.perf_counter()
+        deadline = started + duration
+
+        if rate:
+            # Open loop: requests are issued on a fixed schedule, at most
+            # `concurrency` at a time.
+            semaphore = asyncio.Semaphore(concurrency)
+            tasks = []
+
+            async def limited(scenario, scheduled):
+                async with semaphore:
+                    await _issue(ctx, recorder, scenario, scheduled)
+
+            i = 0
+            while True:
+                scheduled = started + i / rate
+                if scheduled >= deadline:
+                    break
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(limited(rng.choices(names, weights)[0], scheduled)))
+                i += 1
+            await asyncio.gather(*tasks)
+        else:
+            # Closed loop: `concurrency` workers issue back-to-back requests.
+            async def worker():
+                while time.perf_counter() < deadline:
+                    await _issue(ctx, recorder, rng.choices(names, weights)[0], time.perf_counter())
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed)
+
+
+async def run_offline(args, mix):
+    """Start the stub upstream and the proxy in-process, then run the load."""
+    stub = create_stub_app(render_delay=args.render_delay, seed_projects=args.seed_projects)
+    async with offline_proxy(stub) as proxy_url:
+        slugs = [p['slug'] for p in stub.state.projects.values()]
+        result = await run_load(proxy_url, args.duration, args.concurrency, args.rate, mix, args.seed, slugs)
+        result['upstream_requests'] = stub.state.hits
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Async load benchmark for backend/server.py')
+    parser.add_argument('--base-url', help='benchmark a running proxy instead of the offline stack')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load (default 10)')
+    parser.add_argument('--concurrency', type=int, default=20, help='max requests in flight (default 20)')
+    parser.add_argument('--rate', type=float, default=0.0, help='requests/second; 0 = closed loop at full concurrency')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'scenario weights (default {DEFAULT_MIX})')
+    parser.add_argument('--slugs', default='', help='comma-separated slugs for --base-url runs')
+    parser.add_argument('--render-delay', type=float, default=0.02, help='offline stub page render time in seconds')
+    parser.add_argument('--seed-projects', type=int, default=20, help='offline stub catalogue size')
+    parser.add_argument('--admin-password', default=os.environ.get('ADMIN_PASSWORD', ''),
+                        help='admin password for creates in --base-url runs (default $ADMIN_PASSWORD)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for the request mix')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.base_url:
+        slugs = [s for s in args.slugs.split(',') if s]
+        result = asyncio.run(run_load(
+            args.base_url, args.duration, args.concurrency, args.rate, mix, args.seed, slugs, args.admin_password,
+        ))
+    else:
+        result = asyncio.run(run_offline(args, mix))
+
+    result['config'] = {
+        'base_url': args.base_url or 'offline',
+        'duration_s': args.duration,
+        'concurrency': args.concurrency,
+        'rate_rps': args.rate or None,
+        'mix': mix,
+    }
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    return 0 if result['overall']['errors'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
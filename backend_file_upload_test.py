@@ -13,6 +13,22 @@ class FileUploadAPITester:
         self.tests_run = 0
         self.tests_passed = 0
         self.created_project_id = None
+        # Set by login(); a plain admin_auth=authenticated cookie is rejected.
+        self.admin_headers = {}
+
+    def login(self):
+        """Log in through the proxy; admin calls need the signed session cookie it sets"""
+        response = requests.post(
+            f"{self.base_url}/api/admin/login",
+            json={'password': os.environ.get('ADMIN_PASSWORD', '')},
+            timeout=30
+        )
+        token = response.cookies.get('admin_auth') if response.status_code == 200 else None
+        if not token:
+            print(f"❌ Admin login failed: {response.status_code} - {response.text[:200]}")
+            return False
+        self.admin_headers = {'Cookie': f'admin_auth={token}'}
+        return True
 
     def run_test(self, name, method, endpoint, expected_status, data=None, files=None, headers=None):
         """Run a single API test"""
@@ -27,14 +43,14 @@ class FileUploadAPITester:
             elif method == 'POST':
                 if files:
                     # For file uploads, don't set Content-Type header - let requests handle it
-                    response = requests.post(url, data=data, files=files, timeout=30)
+                    response = requests.post(url, data=data, files=files, headers=headers, timeout=30)
                 else:
                     if headers is None:
                         headers = {'Content-Type': 'application/json'}
                     response = requests.post(url, json=data, headers=headers, timeout=10)
             elif method == 'PUT':
                 if files:
-                    response = requests.put(url, data=data, files=files, timeout=30)
+                    response = requests.put(url, data=data, files=files, headers=headers, timeout=30)
                 else:
                     if headers is None:
                         headers = {'Content-Type': 'application/json'}
@@ -111,7 +127,7 @@ class FileUploadAPITester:
         }
         
         # Set admin auth cookie
-        headers = {'Cookie': 'admin_auth=authenticated'}
+        headers = self.admin_headers
         
         success, response_data = self.run_test(
             "Admin Create Project (With File Upload & Auth)",
@@ -153,7 +169,7 @@ class FileUploadAPITester:
             'gallery_images': ('new_gallery.jpg', new_gallery, 'image/jpeg')
         }
         
-        headers = {'Cookie': 'admin_auth=authenticated'}
+        headers = self.admin_headers
         
         success, response_data = self.run_test(
             "Admin Update Project (With File Upload)",
@@ -173,7 +189,7 @@ class FileUploadAPITester:
             print("❌ Skipped - No project ID available")
             return False
             
-        headers = {'Cookie': 'admin_auth=authenticated'}
+        headers = self.admin_headers
         
         success, response_data = self.run_test(
             "Admin Delete Project (With Storage Cleanup)",
@@ -200,7 +216,7 @@ class FileUploadAPITester:
             'cover_image': ('large.jpg', large_image, 'image/jpeg')
         }
         
-        headers = {'Cookie': 'admin_auth=authenticated'}
+        headers = self.admin_headers
         
         success, response_data = self.run_test(
             "Admin Create Project (File Too Large - Should Fail)",
@@ -229,7 +245,7 @@ class FileUploadAPITester:
             'cover_image': ('document.txt', text_file, 'text/plain')
         }
         
-        headers = {'Cookie': 'admin_auth=authenticated'}
+        headers = self.admin_headers
         
         success, response_data = self.run_test(
             "Admin Create Project (Invalid File Type - Should Fail)",
@@ -284,6 +300,9 @@ def main():
     # Setup
     tester = FileUploadAPITester("https://7eea4923-fa73-44b8-bd6f-bf1f9153a434.preview.emergentagent.com")
     
+    if not tester.login():
+        return 1
+
     # Test file upload functionality
     print("\n📡 Testing File Upload API Endpoints...")
     
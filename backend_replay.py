@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Replay captured proxy traffic at 1x to Nx speed.
+
+Reads a log written by the proxy's traffic capture (PROXY_CAPTURE_SAMPLE_RATE,
+see backend/capture.py) and re-issues each request on the captured schedule,
+compressed by --speed, so the real mix of page views, searches and admin
+uploads can be checked against a capacity change before rollout. Requests
+are rebuilt from their route pattern: slugs and search terms are filled in,
+and uploads send an image padded to the captured request size. Deletes, and
+routes that cannot be rebuilt, are counted as skipped.
+
+The report has the same shape as backend_benchmark.py, keyed by
+"METHOD route", with the captured latencies alongside the replayed ones.
+
+By default it runs fully offline: backend/server.py is started in-process
+against stub_upstream.py. Pass --base-url to replay against a running proxy.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import httpx
+
+from backend_benchmark import Recorder, _ms, create_test_image, percentile
+from stub_upstream import BACKEND_DIR, admin_login, create_stub_app, offline_proxy
+
+sys.path.insert(0, BACKEND_DIR)
+from capture import parse_line  # noqa: E402
+
+SEARCH_TERMS = ['villa', 'amman', 'stone', 'project', 'glass', 'interior']
+# Stay under the 5MB per-file limit whatever size was captured.
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024 - 64 * 1024
+PAD_BUCKET = 64 * 1024
+
+
+def load_records(path, limit=None):
+    """Captured records in the order the requests started."""
+    records = []
+    with open(path) as f:
+        for line in f:
+            record = parse_line(line)
+            if record is not None:
+                record['start_ms'] = record['ts_ms'] - (record['duration_ms'] or 0)
+                records.append(record)
+    records.sort(key=lambda r: r['start_ms'])
+    return records[:limit] if limit else records
+
+
+@lru_cache(maxsize=None)
+def padded_image(size):
+    """A JPEG padded with trailing bytes to roughly ``size``, in 64KB steps."""
+    image = create_test_image()
+    target = min(MAX_UPLOAD_BYTES, -(-max(size, len(image)) // PAD_BUCKET) * PAD_BUCKET)
+    return image + b'\0' * max(0, target - len(image))
+
+
+class Replayer:
+    def __init__(self, client, admin, slugs, project_ids, rng):
+        self.client = client
+        self.admin = admin
+        self.slugs = slugs
+        self.project_ids = project_ids
+        self.rng = rng
+
+    def _cover(self, record):
+        return ('cover_image', ('replay.jpg', padded_image(record['request_bytes']), 'image/jpeg'))
+
+    async def issue(self, record):
+        """Send the request for one record; None if it cannot be replayed."""
+        method, route = record['method'], record['route']
+        admin = self.admin if route.startswith('/api/admin/') else None
+
+        if method in ('GET', 'HEAD'):
+            if route == '/projects/[slug]':
+                if not self.slugs:
+                    return None
+                route = f'/projects/{self.rng.choice(self.slugs)}'
+            elif route == '/api/projects/search':
+                route = f'{route}?q={self.rng.choice(SEARCH_TERMS)}'
+            elif route == 'other' or '[' in route:
+                return None
+            return await self.client.request(method, route, cookies=admin)
+
+        name = f'Replay Project {datetime.now().strftime("%H%M%S%f")}'
+        if method == 'POST' and route == '/api/admin/projects/create':
+            return await self.client.post(
+                route, data={'name': name, 'category': 'architecture'}, files=[self._cover(record)], cookies=admin,
+            )
+        if method == 'PUT' and route == '/api/admin/projects/update' and self.project_ids:
+            data = {'id': self.rng.choice(self.project_ids), 'name': name, 'existing_gallery_urls': '[]'}
+            return await self.client.put(route, data=data, files=[self._cover(record)], cookies=admin)
+        if method == 'POST' and route in ('/api/admin/upload', '/api/admin/upload/batch'):
+            field = 'files' if route.endswith('/batch') else 'file'
+            data = {'folder': 'gallery', 'projectSlug': f'replay-{self.rng.getrandbits(32):08x}'}
+            files = [(field, ('replay.jpg', padded_image(record['request_bytes']), 'image/jpeg'))]
+            return await self.client.post(route, data=data, files=files, cookies=admin)
+        if method == 'POST' and route == '/api/admin/login':
+            return await self.client.post(route, json={'password': ''})
+        return None
+
+
+async def _replay_one(replayer, recorder, skipped, record, scheduled):
+    key = f"{record['method']} {record['route']}"
+    try:
+        response = await replayer.issue(record)
+        if response is None:
+            skipped[key] = skipped.get(key, 0) + 1
+            return
+        status = response.status_code
+        ok = status < 500
+    except httpx.HTTPError as e:
+        ok, status = False, type(e).__name__
+    recorder.record(key, time.perf_counter() - scheduled, ok, status)
+
+
+def captured_latencies(records):
+    by_key = {}
+    for record in records:
+        if record['duration_ms'] is not None:
+            by_key.setdefault(f"{record['method']} {record['route']}", []).append(record['duration_ms'] / 1000)
+    summary = {}
+    for key, values in by_key.items():
+        values.sort()
+        summary[key] = {'p50': _ms(percentile(values, 50)), 'p95': _ms(percentile(values, 95)),
+                        'p99': _ms(percentile(values, 99))}
+    return summary
+
+
+async def replay(base_url, records, speed, concurrency, seed=None, slugs=(), project_ids=(), password=''):
+    rng = random.Random(seed)
+    recorder = Recorder()
+    skipped = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        needs_admin = any(r['route'].startswith('/api/admin/') for r in records)
+        admin = await admin_login(client, password) if needs_admin else {}
+        replayer = Replayer(client, admin, list(slugs), list(project_ids), rng)
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        async def limited(record, scheduled):
+            async with semaphore:
+                await _replay_one(replayer, recorder, skipped, record, scheduled)
+
+        started = time.perf_counter()
+        first = records[0]['start_ms'] if records else 0
+        for record in records:
+            scheduled = started + (record['start_ms'] - first) / 1000 / speed
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(limited(record, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    result = recorder.summary(elapsed)
+    for key, latency in captured_latencies(records).items():
+        if key in result['scenarios']:
+            result['scenarios'][key]['captured_latency_ms'] = latency
+    result['skipped'] = dict(sorted(skipped.items()))
+    return result
+
+
+async def run_offline(args, records):
+    """Start the stub upstream and the proxy in-process, then replay."""
+    stub = create_stub_app(render_delay=args.render_delay, seed_projects=args.seed_projects)
+    async with offline_proxy(stub) as proxy_url:
+        projects = list(stub.state.projects.values())
+        return await replay(
+            proxy_url, records, args.speed, args.concurrency, args.seed,
+            [p['slug'] for p in projects], [p['id'] for p in projects],
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a proxy traffic capture')
+    parser.add_argument('capture', help='log written by the proxy traffic capture')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed multiplier (default 1)')
+    parser.add_argument('--limit', type=int, default=None, help='replay only the first N requests')
+    parser.add_argument('--concurrency', type=int, default=256, help='max requests in flight (default 256)')
+    parser.add_argument('--base-url', help='replay against a running proxy instead of the offline stack')
+    parser.add_argument('--slugs', default='', help='comma-separated slugs for --base-url runs')
+    parser.add_argument('--admin-password', default=os.environ.get('ADMIN_PASSWORD', ''),
+                        help='admin password for --base-url runs (default $ADMIN_PASSWORD)')
+    parser.add_argument('--render-delay', type=float, default=0.02, help='offline stub page render time in seconds')
+    parser.add_argument('--seed-projects', type=int, default=20, help='offline stub catalogue size')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for slugs and search terms')
+    parser.add_argument('--output', help='also write the JSON report to this file')
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error('--speed must be positive')
+
+    records = load_records(args.capture, args.limit)
+    if not records:
+        parser.error(f'No records in {args.capture}')
+
+    if args.base_url:
+        slugs = [s for s in args.slugs.split(',') if s]
+        result = asyncio.run(replay(
+            args.base_url, records, args.speed, args.concurrency, args.seed, slugs, (), args.admin_password,
+        ))
+    else:
+        result = asyncio.run(run_offline(args, records))
+
+    span = (records[-1]['start_ms'] - records[0]['start_ms']) / 1000
+    result['config'] = {
+        'capture': args.capture,
+        'base_url': args.base_url or 'offline',
+        'records': len(records),
+        'captured_span_s': round(span, 3),
+        'speed': args.speed,
+        'concurrency': args.concurrency,
+    }
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    return 0 if result['overall']['errors'] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,9 +17,22 @@ class FileUploadAPITester:
         self.tests_run = 0
         self.tests_passed = 0
         self.created_project_id = None
-        self.headers = {
-            'Cookie': 'admin_auth=authenticated'
-        }
+        # Set by login(); a plain admin_auth=authenticated cookie is rejected.
+        self.headers = {}
+
+    def login(self):
+        """Log in through the proxy; admin calls need the signed session cookie it sets"""
+        response = requests.post(
+            f"{self.base_url}/api/admin/login",
+            json={'password': os.environ.get('ADMIN_PASSWORD', '')},
+            timeout=30
+        )
+        token = response.cookies.get('admin_auth') if response.status_code == 200 else None
+        if not token:
+            print(f"❌ Admin login failed: {response.status_code} - {response.text[:200]}")
+            return False
+        self.headers = {'Cookie': f'admin_auth={token}'}
+        return True
 
     def log_test(self, name, success, details=""):
         """Log test results"""
@@ -309,6 +322,9 @@ class FileUploadAPITester:
         print("=" * 60)
         print()
 
+        if not self.login():
+            return False
+
         # Test authentication requirement
         self.test_authentication_required()
         
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Offline parallel runner for the backend API tests.
+
+Runs the cases from backend_test.py and backend_file_upload_test.py
+concurrently with asyncio and httpx. Independent cases run side by side; a
+create -> update -> delete workflow is one case, so its steps stay in order.
+Image fixtures are encoded once per (format, size) and shared by every case.
+
+By default backend/server.py is started in-process against stub_upstream.py
+standing in for Next.js and Supabase, so the suite needs no network access.
+Pass --base-url to run the same cases against a deployment instead.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import httpx
+
+from stub_upstream import admin_login, create_stub_app, offline_proxy
+
+COLORS = {'JPEG': 'red', 'PNG': 'blue', 'WEBP': 'green'}
+CONTENT_TYPES = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+MAX_FILE_SIZE = 5 * 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def image_fixture(format='JPEG', size=(200, 200)):
+    """Encoded test image; built once per format and size."""
+    from PIL import Image as PILImage
+
+    mode = 'RGBA' if format == 'PNG' else 'RGB'
+    img = PILImage.new(mode, size, color=COLORS[format])
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format=format)
+    return img_bytes.getvalue()
+
+
+@lru_cache(maxsize=None)
+def oversized_fixture():
+    """A PNG just over the 5MB limit.
+
+    A flat colour compresses to a few kilobytes however large the image, so
+    the pixels are noise (seeded, so every run sends the same bytes).
+    """
+    from PIL import Image as PILImage
+
+    side = 1400
+    noise = random.Random(0).randbytes(side * side * 3)
+    img_bytes = io.BytesIO()
+    PILImage.frombytes('RGB', (side, side), noise).save(img_bytes, format='PNG', compress_level=0)
+    data = img_bytes.getvalue()
+    assert len(data) > MAX_FILE_SIZE
+    return data
+
+
+def image_file(field, name, format='JPEG', size=(200, 200)):
+    return (field, (name, image_fixture(format, size), CONTENT_TYPES[format]))
+
+
+def project_form(prefix, **overrides):
+    data = {
+        'name': f'{prefix} {datetime.now().strftime("%H%M%S%f")}',
+        'category': 'architecture',
+        'location': 'Test Location',
+        'year': '2024',
+        'summary': 'Test project summary',
+        'story': 'Test project story',
+        'scope': 'Test scope',
+        'materials': 'Test materials',
+        'area_sqm': '100',
+        'client_name': 'Test Client',
+        'is_featured': 'false',
+    }
+    data.update(overrides)
+    return data
+
+
+class CaseFailed(Exception):
+    pass
+
+
+def expect(response, status):
+    """Check the status code and return the JSON body (or None)."""
+    body = None
+    if response.headers.get('content-type', '').startswith('application/json'):
+        body = response.json()
+    if response.status_code != status:
+        detail = body.get('error') if isinstance(body, dict) else response.text[:200]
+        raise CaseFailed(f'Expected {status}, got {response.status_code}: {detail}')
+    return body
+
+
+def expect_error(body, *fragments):
+    error = (body or {}).get('error', '')
+    if not any(fragment in error.lower() for fragment in fragments):
+        raise CaseFailed(f'Wrong error message: {error!r}')
+    return error
+
+
+# --- Cases ------------------------------------------------------------------
+# Each case takes an httpx.AsyncClient and the admin session cookies, raises
+# CaseFailed on failure and returns a short detail string.
+
+async def case_authentication_required(client, admin):
+    files = [image_file('cover_image', 'cover.jpg')]
+    response = await client.post(
+        '/api/admin/projects/create',
+        data={'name': 'Unauthorized Test Project', 'category': 'architecture'},
+        files=files,
+    )
+    body = expect(response, 401)
+    expect_error(body, 'unauthorized')
+    return 'Rejected without admin cookie'
+
+
+async def case_forged_session_rejected(client, admin):
+    """The unsigned cookie the Next.js routes check is not a session."""
+    response = await client.post(
+        '/api/admin/projects/create',
+        data={'name': 'Forged Session Project', 'category': 'architecture'},
+        files=[image_file('cover_image', 'cover.jpg')],
+        cookies={'admin_auth': 'authenticated'},
+    )
+    expect_error(expect(response, 401), 'unauthorized')
+    return 'Rejected unsigned admin cookie'
+
+
+async def case_invalid_file_type(client, admin):
+    response = await client.post(
+        '/api/admin/projects/create',
+        data={'name': 'Test Invalid Type Project', 'category': 'architecture'},
+        files=[('cover_image', ('document.txt', b'This is not an image', 'text/plain'))],
+        cookies=admin,
+    )
+    body = expect(response, 400)
+    return expect_error(body, 'invalid file type', 'only jpeg, png, and webp')
+
+
+async def case_file_too_large(client, admin):
+    response = await client.post(
+        '/api/admin/projects/create',
+        data={'name': 'Test Validation Project', 'category': 'architecture'},
+        files=[('cover_image', ('large.png', oversized_fixture(), 'image/png'))],
+        cookies=admin,
+    )
+    body = expect(response, 400)
+    return expect_error(body, 'too large')
+
+
+async def _project_lifecycle(client, admin, create_files, update_files, category, update_category):
+    """Create a project with files, replace them, then delete it."""
+    response = await client.post(
+        '/api/admin/projects/create',
+        data=project_form('Test File Upload Project', category=category),
+        files=create_files,
+        cookies=admin,
+    )
+    project = (expect(response, 200) or {}).get('project')
+    if not project or not project.get('cover_image_url'):
+        raise CaseFailed(f'Invalid create response: {project}')
+    gallery_count = sum(1 for field, _ in create_files if field == 'gallery_images')
+    if len(project.get('gallery') or []) != gallery_count:
+        raise CaseFailed(f"Expected {gallery_count} gallery images, got {len(project.get('gallery') or [])}")
+
+    response = await client.put(
+        '/api/admin/projects/update',
+        data={
+            'id': str(project['id']),
+            'name': f'Updated Project {datetime.now().strftime("%H%M%S%f")}',
+            'category': update_category,
+            'location': 'Updated Location',
+            'year': '2025',
+            'summary': 'Updated project summary',
+            'existing_gallery_urls': '[]',
+        },
+        files=update_files,
+        cookies=admin,
+    )
+    updated = (expect(response, 200) or {}).get('project')
+    if not updated or updated.get('cover_image_url') == project['cover_image_url']:
+        raise CaseFailed(f'Cover image was not replaced: {updated}')
+
+    response = await client.delete(f"/api/admin/projects/delete?id={project['id']}", cookies=admin)
+    if not (expect(response, 200) or {}).get('success'):
+        raise CaseFailed('Delete did not report success')
+    return f"Project {project['id']}: created, updated and deleted"
+
+
+async def case_project_lifecycle(client, admin):
+    """backend_test.py: JPEG/PNG create, WebP cover on update."""
+    return await _project_lifecycle(
+        client, admin,
+        [
+            image_file('cover_image', 'test_cover.jpg', 'JPEG', (100, 100)),
+            image_file('gallery_images', 'gallery1.png', 'PNG', (100, 100)),
+            image_file('gallery_images', 'gallery2.jpg', 'JPEG', (100, 100)),
+        ],
+        [
+            image_file('cover_image', 'updated_cover.webp', 'WEBP', (100, 100)),
+            image_file('gallery_images', 'new_gallery.jpg', 'JPEG', (100, 100)),
+        ],
+        'real_estate', 'architecture',
+    )
+
+
+async def case_admin_project_lifecycle(client, admin):
+    """backend_file_upload_test.py: JPEG files of several sizes."""
+    return await _project_lifecycle(
+        client, admin,
+        [
+            image_file('cover_image', 'cover.jpg'),
+            image_file('gallery_images', 'gallery1.jpg', size=(150, 150)),
+            image_file('gallery_images', 'gallery2.jpg', size=(180, 180)),
+        ],
+        [
+            image_file('cover_image', 'new_cover.jpg', size=(250, 250)),
+            image_file('gallery_images', 'new_gallery.jpg'),
+        ],
+        'architecture', 'real_estate',
+    )
+
+
+async def case_projects_page_loads(client, admin):
+    response = await client.get('/projects')
+    expect(response, 200)
+    return f'{len(response.content)} bytes'
+
+
+async def case_static_traversal_blocked(client, admin):
+    """/_next/static/ serves .next/static only, however ``..`` is spelt."""
+    for path in ('/_next/static/%2e%2e/prerender-manifest.json', '/_next/static/..%2fprerender-manifest.json'):
+        response = await client.get(path)
+        if response.status_code == 200:
+            raise CaseFailed(f'{path} was served: {response.text[:80]}')
+    return 'Build files outside static/ not served'
+
+
+CASES = {
+    'authentication_required': case_authentication_required,
+    'forged_session_rejected': case_forged_session_rejected,
+    'invalid_file_type': case_invalid_file_type,
+    'file_too_large': case_file_too_large,
+    'project_lifecycle': case_project_lifecycle,
+    'admin_project_lifecycle': case_admin_project_lifecycle,
+    'projects_page_loads': case_projects_page_loads,
+    'static_traversal_blocked': case_static_traversal_blocked,
+}
+
+
+# --- Runner -----------------------------------------------------------------
+
+async def _run_case(client, admin, name):
+    started = time.perf_counter()
+    try:
+        detail, ok = await CASES[name](client, admin), True
+    except CaseFailed as e:
+        detail, ok = str(e), False
+    except httpx.HTTPError as e:
+        detail, ok = f'{type(e).__name__}: {e}', False
+    return {'name': name, 'passed': ok, 'detail': detail, 'ms': round((time.perf_counter() - started) * 1000, 1)}
+
+
+async def run_cases(base_url, names, concurrency, password=''):
+    # Encode every fixture before the clock starts.
+    await asyncio.to_thread(oversized_fixture)
+    limits = httpx.Limits(max_connections=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+        admin = await admin_login(client, password)
+
+        async def limited(name):
+            async with semaphore:
+                return await _run_case(client, admin, name)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(limited(name) for name in names))
+        elapsed = time.perf_counter() - started
+    return {'elapsed_s': round(elapsed, 3), 'results': list(results)}
+
+
+async def run_offline(names, concurrency):
+    """Start the stub upstream and the proxy in-process, then run the cases."""
+    with tempfile.TemporaryDirectory() as build_dir:
+        # A build directory with a file outside static/ for the traversal case.
+        os.makedirs(os.path.join(build_dir, 'static'))
+        with open(os.path.join(build_dir, 'prerender-manifest.json'), 'w') as f:
+            f.write('{"preview": {"previewModeSigningKey": "secret"}}')
+        os.environ.setdefault('NEXT_BUILD_DIR', build_dir)
+        async with offline_proxy(create_stub_app(seed_projects=5)) as proxy_url:
+            return await run_cases(proxy_url, names, concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel backend API tests')
+    parser.add_argument('--base-url', help='test a running proxy instead of the offline stack')
+    parser.add_argument('--concurrency', type=int, default=len(CASES), help='max cases in flight')
+    parser.add_argument('-k', dest='only', default='', help='comma-separated case names to run')
+    parser.add_argument('--admin-password', default=os.environ.get('ADMIN_PASSWORD', ''),
+                        help='admin password for --base-url runs (default $ADMIN_PASSWORD)')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    names = [n for n in args.only.split(',') if n] or list(CASES)
+    unknown = set(names) - set(CASES)
+    if unknown:
+        parser.error(f"Unknown case(s): {', '.join(sorted(unknown))}")
+
+    if args.base_url:
+        report = asyncio.run(run_cases(args.base_url, names, args.concurrency, args.admin_password))
+    else:
+        report = asyncio.run(run_offline(names, args.concurrency))
+
+    passed = sum(r['passed'] for r in report['results'])
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for r in report['results']:
+            mark = '✅' if r['passed'] else '❌'
+            print(f"{mark} {r['name']} ({r['ms']} ms) - {r['detail']}")
+        print('=' * 60)
+        print(f"📊 {passed}/{len(names)} passed in {report['elapsed_s']}s ({args.base_url or 'offline'})")
+    return 0 if passed == len(names) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+// Verifies the signed admin_auth token the proxy (backend/admin_session.py)
+// issues at login: `<expires>.<nonce>.<signature>`, HMAC-SHA256 over
+// `<expires>.<nonce>` keyed by ADMIN_SESSION_SECRET, base64url without padding.
+
+const encoder = new TextEncoder();
+let keyPromise = null;
+
+function hmacKey(secret) {
+  if (!keyPromise) {
+    keyPromise = crypto.subtle.importKey(
+      'raw',
+      encoder.encode(secret),
+      { name: 'HMAC', hash: 'SHA-256' },
+      false,
+      ['verify']
+    );
+  }
+  return keyPromise;
+}
+
+function decodeBase64Url(text) {
+  const base64 = text.replace(/-/g, '+').replace(/_/g, '/');
+  const binary = atob(base64 + '='.repeat((4 - (base64.length % 4)) % 4));
+  return Uint8Array.from(binary, (c) => c.charCodeAt(0));
+}
+
+export async function verifyAdminSession(token) {
+  const secret = process.env.ADMIN_SESSION_SECRET;
+  if (!secret || !token || token.length > 96) return false;
+
+  const parts = token.split('.');
+  if (parts.length !== 3 || !/^\d+$/.test(parts[0])) return false;
+  if (Number(parts[0]) <= Date.now() / 1000) return false;
+
+  try {
+    const signature = decodeBase64Url(parts[2]);
+    const payload = encoder.encode(`${parts[0]}.${parts[1]}`);
+    return await crypto.subtle.verify('HMAC', await hmacKey(secret), signature, payload);
+  } catch {
+    return false;
+  }
+}
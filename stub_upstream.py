@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Next.js and Supabase used by the offline backend tools.
+
+Implements just enough of the public pages, the admin project routes and the
+Supabase Storage REST API for backend/server.py to be exercised without
+network access. Validation rules and error messages mirror the Next.js routes.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, Response
+from starlette.datastructures import UploadFile
+from starlette.requests import ClientDisconnect
+
+MAX_FILE_SIZE = 5 * 1024 * 1024
+ALLOWED_TYPES = ['image/jpeg', 'image/png', 'image/webp']
+CATEGORIES = ['real_estate', 'architecture', 'interior_contracting', 'renovation']
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+# Environment for an offline proxy; values already set win. All traffic comes
+# from one address, so per-client rate limits would measure the limiter,
+# admin logins need a signing secret, and the stub accepts any service key.
+OFFLINE_ENV = {
+    'PROXY_RATE_LIMIT_RPS': '0',
+    'PROXY_ADMIN_RATE_LIMIT_RPS': '0',
+    'ADMIN_SESSION_SECRET': 'offline',
+    'SUPABASE_SERVICE_ROLE_KEY': 'offline',
+}
+
+
+def slugify(text):
+    """Same rules as lib/slugify.js"""
+    text = str(text).lower().strip()
+    text = re.sub(r'\s+', '-', text)
+    text = re.sub(r'[^\w\-]+', '', text)
+    return re.sub(r'\-\-+', '-', text)
+
+
+def sanitize_file_name(name):
+    return re.sub(r'[^a-zA-Z0-9._-]', '_', name)
+
+
+def sort_value(value):
+    """Order numbers as numbers, like Postgres; everything else as text."""
+    text = str(value or '')
+    return (0, int(text), '') if text.isdigit() else (1, 0, text)
+
+
+def validate_file(file):
+    if file.content_type not in ALLOWED_TYPES:
+        return f"Invalid file type: {file.filename}. Only JPEG, PNG, and WebP are allowed."
+    if file.size > MAX_FILE_SIZE:
+        return f"File too large: {file.filename}. Maximum size is 5MB."
+    return None
+
+
+def create_stub_app(render_delay=0.0, storage_delay=0.0, seed_projects=0):
+    """Build the stub app.
+
+    render_delay and storage_delay (seconds) simulate Next.js render time and
+    Supabase Storage round trips; seed_projects pre-populates the catalogue.
+    """
+    app = FastAPI()
+    ids = itertools.count(1)
+    projects = {}   # id -> project row
+    storage = {}    # object path -> (bytes, content type)
+    stored_at = {}  # object path -> upload time
+    app.state.projects = projects
+    app.state.storage = storage
+    app.state.stored_at = stored_at
+    app.state.hits = 0
+
+    def public_url(request, path):
+        return f"{str(request.base_url).rstrip('/')}/storage/v1/object/public/projects/{path}"
+
+    def storage_path(url):
+        match = re.search(r'/object/public/projects/(.+)$', url or '')
+        return match.group(1) if match else None
+
+    def is_admin(request):
+        return request.cookies.get('admin_auth') == 'authenticated'
+
+    def unauthorized():
+        return JSONResponse({'error': 'Unauthorized'}, status_code=401)
+
+    async def upload(request, file, folder, slug):
+        data = await file.read()
+        path = f"{folder}/{slug}/{int(time.time() * 1000)}-{sanitize_file_name(file.filename)}"
+        if storage_delay:
+            await asyncio.sleep(storage_delay)
+        storage[path] = (data, file.content_type)
+        stored_at[path] = time.time()
+        return public_url(request, path)
+
+    def unique_slug(name, exclude_id=None):
+        slug = slugify(name)
+        if any(p['slug'] == slug and p['id'] != exclude_id for p in projects.values()):
+            slug = f"{slug}-{int(time.time() * 1000)}"
+        return slug
+
+    def form_files(form, field):
+        return [f for f in form.getlist(field) if isinstance(f, UploadFile) and f.size]
+
+    for i in range(seed_projects):
+        project_id = str(next(ids))
+        projects[project_id] = {
+            'id': project_id,
+            'name': f'Seed Project {i}',
+            'slug': f'seed-project-{i}',
+            'category': CATEGORIES[i % len(CATEGORIES)],
+            'location': 'Amman, Jordan',
+            'year': 2024,
+            'cover_image_url': f'https://images.unsplash.com/photo-{i}?w=1200',
+            'gallery': [],
+            'summary': f'Summary for seed project {i}',
+            'story': 'Story ' * 200,
+            'scope': None,
+            'materials': 'Stone, glass',
+            'area_sqm': 100 + i,
+            'client_name': None,
+            'is_featured': i % 3 == 0,
+            'created_at': datetime.now().isoformat(),
+        }
+
+    @app.middleware('http')
+    async def count_hits(request, call_next):
+        app.state.hits += 1
+        try:
+            return await call_next(request)
+        except ClientDisconnect:
+            # The proxy aborts an oversized upload mid-body; nobody is
+            # waiting for this response.
+            return Response(status_code=499)
+
+    # --- Supabase Storage -------------------------------------------------
+
+    @app.api_route('/storage/v1/object/public/projects/{path:path}', methods=['GET', 'HEAD'])
+    async def storage_get(path: str):
+        if path not in storage:
+            return JSONResponse({'message': 'Object not found'}, status_code=404)
+        data, content_type = storage[path]
+        return Response(data, media_type=content_type)
+
+    @app.post('/storage/v1/object/projects/{path:path}')
+    async def storage_put(path: str, request: Request):
+        if path in storage and request.headers.get('x-upsert') != 'true':
+            return JSONResponse({'message': 'The resource already exists'}, status_code=409)
+        if storage_delay:
+            await asyncio.sleep(storage_delay)
+        storage[path] = (await request.body(), request.headers.get('content-type', 'application/octet-stream'))
+        stored_at[path] = time.time()
+        return {'Key': f'projects/{path}'}
+
+    @app.post('/storage/v1/object/list/projects')
+    async def storage_list(request: Request):
+        body = await request.json()
+        prefix = body.get('prefix', '').strip('/')
+        start = f'{prefix}/' if prefix else ''
+        entries = {}
+        for path in storage:
+            if not path.startswith(start):
+                continue
+            name, slash, _ = path[len(start):].partition('/')
+            if slash:
+                entries.setdefault(name, {'name': name, 'id': None, 'metadata': None})
+            else:
+                data, content_type = storage[path]
+                entries[name] = {
+                    'name': name,
+                    'id': path,
+                    'created_at': datetime.fromtimestamp(stored_at.get(path, 0), timezone.utc).isoformat(),
+                    'metadata': {'size': len(data), 'mimetype': content_type},
+                }
+        rows = [entries[name] for name in sorted(entries)]
+        offset = int(body.get('offset', 0))
+        return rows[offset:offset + int(body.get('limit', 100))]
+
+    @app.delete('/storage/v1/object/projects')
+    async def storage_remove(request: Request):
+        removed = []
+        for path in (await request.json()).get('prefixes', []):
+            if storage.pop(path, None) is not None:
+                stored_at.pop(path, None)
+                removed.append({'name': path, 'bucket_id': 'projects'})
+        return removed
+
+    # --- Supabase PostgREST ----------------------------------------------
+
+    @app.get('/rest/v1/projects')
+    async def rest_projects(request: Request):
+        params = dict(request.query_params)
+        rows = list(projects.values())
+        for column, value in params.items():
+            if value.startswith('eq.'):
+                rows = [r for r in rows if str(r.get(column)) == value[3:]]
+            elif value.startswith('gt.'):
+                rows = [r for r in rows if sort_value(r.get(column)) > sort_value(value[3:])]
+        column, _, direction = params.get('order', 'created_at.asc').partition('.')
+        rows.sort(key=lambda r: (sort_value(r.get(column)), int(r['id'])), reverse=direction == 'desc')
+        offset = int(params.get('offset', 0))
+        rows = rows[offset:offset + int(params['limit'])] if 'limit' in params else rows[offset:]
+        select = params.get('select', '*')
+        if select != '*':
+            columns = select.split(',')
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+        return rows
+
+    # --- Next.js admin API -----------------------------------------------
+
+    @app.post('/api/admin/login')
+    async def login(request: Request):
+        response = JSONResponse({'success': True})
+        response.set_cookie('admin_auth', 'authenticated', httponly=True, samesite='strict', max_age=86400)
+        return response
+
+    @app.post('/api/admin/projects/create')
+    async def create_project(request: Request):
+        if not is_admin(request):
+            return unauthorized()
+        form = await request.form()
+        name = form.get('name')
+        if not name:
+            return JSONResponse({'error': 'Project name is required'}, status_code=400)
+        covers = form_files(form, 'cover_image')
+        if not covers:
+            return JSONResponse({'error': 'Cover image is required'}, status_code=400)
+        gallery_files = form_files(form, 'gallery_images')
+        for f in covers[:1] + gallery_files:
+            error = validate_file(f)
+            if error:
+                return JSONResponse({'error': error}, status_code=400)
+
+        slug = unique_slug(name)
+        cover_url = await upload(request, covers[0], 'covers', slug)
+        try:
+            gallery = [u for u in json.loads(form.get('gallery_urls') or '[]') if isinstance(u, str) and u]
+        except ValueError:
+            gallery = []
+        gallery += [await upload(request, f, 'gallery', slug) for f in gallery_files]
+        project_id = str(next(ids))
+        project = {
+            'id': project_id,
+            'name': name,
+            'slug': slug,
+            'category': form.get('category') or 'real_estate',
+            'location': form.get('location') or None,
+            'year': int(form['year']) if form.get('year') else None,
+            'cover_image_url': cover_url,
+            'gallery': gallery,
+            'summary': form.get('summary') or None,
+            'story': form.get('story') or None,
+            'scope': form.get('scope') or None,
+            'materials': form.get('materials') or None,
+            'area_sqm': int(form['area_sqm']) if form.get('area_sqm') else None,
+            'client_name': form.get('client_name') or None,
+            'is_featured': form.get('is_featured') == 'true',
+            'created_at': datetime.now().isoformat(),
+        }
+        projects[project_id] = project
+        return {'success': True, 'project': project}
+
+    @app.put('/api/admin/projects/update')
+    async def update_project(request: Request):
+        if not is_admin(request):
+            return unauthorized()
+        form = await request.form()
+        project_id = form.get('id')
+        if not project_id:
+            return JSONResponse({'error': 'Project ID is required'}, status_code=400)
+        existing = projects.get(str(project_id))
+        if existing is None:
+            return JSONResponse({'error': 'Project not found'}, status_code=404)
+
+        name = form.get('name') or existing['name']
+        slug = existing['slug'] if name == existing['name'] else unique_slug(name, existing['id'])
+        cover_url = existing['cover_image_url']
+        for f in form_files(form, 'cover_image')[:1]:
+            error = validate_file(f)
+            if error:
+                return JSONResponse({'error': error}, status_code=400)
+            storage.pop(storage_path(cover_url), None)
+            cover_url = await upload(request, f, 'covers', slug)
+
+        try:
+            kept = json.loads(form.get('existing_gallery_urls') or '[]')
+        except ValueError:
+            kept = []
+        for url in existing['gallery']:
+            if url not in kept:
+                storage.pop(storage_path(url), None)
+        new_files = form_files(form, 'gallery_images')
+        for f in new_files:
+            error = validate_file(f)
+            if error:
+                return JSONResponse({'error': error}, status_code=400)
+        gallery = kept + [await upload(request, f, 'gallery', slug) for f in new_files]
+
+        existing.update({
+            'name': name,
+            'slug': slug,
+            'category': form.get('category') or existing['category'],
+            'location': form.get('location') or None,
+            'year': int(form['year']) if form.get('year') else None,
+            'cover_image_url': cover_url,
+            'gallery': gallery,
+            'summary': form.get('summary') or None,
+            'story': form.get('story') or None,
+            'scope': form.get('scope') or None,
+            'materials': form.get('materials') or None,
+            'area_sqm': int(form['area_sqm']) if form.get('area_sqm') else None,
+            'client_name': form.get('client_name') or None,
+            'is_featured': form.get('is_featured') == 'true',
+        })
+        return {'success': True, 'project': existing}
+
+    @app.delete('/api/admin/projects/delete')
+    async def delete_project(request: Request, id: str = None):
+        if not is_admin(request):
+            return unauthorized()
+        if not id:
+            return JSONResponse({'error': 'Project ID required'}, status_code=400)
+        project = projects.pop(str(id), None)
+        if project is None:
+            return JSONResponse({'error': 'Project not found'}, status_code=400)
+        for url in [project['cover_image_url'], *project['gallery']]:
+            storage.pop(storage_path(url), None)
+        return {'success': True}
+
+    @app.post('/api/admin/upload')
+    async def upload_file(request: Request):
+        if not is_admin(request):
+            return unauthorized()
+        form = await request.form()
+        file = form.get('file')
+        if not isinstance(file, UploadFile):
+            return JSONResponse({'error': 'No file provided'}, status_code=400)
+        url = await upload(request, file, form.get('folder') or 'covers', form.get('projectSlug') or 'temp')
+        return {'success': True, 'url': url}
+
+    # --- Pages ------------------------------------------------------------
+
+    def page(title, body):
+        return f"<!DOCTYPE html><html><head><title>{title} | INVERA</title></head><body>{body}</body></html>"
+
+    async def render():
+        if render_delay:
+            await asyncio.sleep(render_delay)
+
+    @app.get('/', response_class=HTMLResponse)
+    async def home():
+        await render()
+        featured = [p for p in projects.values() if p['is_featured']]
+        return page('Home', ''.join(f"<a href='/projects/{p['slug']}'>{p['name']}</a>" for p in featured))
+
+    @app.get('/about', response_class=HTMLResponse)
+    async def about():
+        await render()
+        return page('About', '<h1>About INVERA</h1>' + '<p>Ultra-luxury real estate.</p>' * 50)
+
+    @app.get('/projects', response_class=HTMLResponse)
+    async def project_list():
+        await render()
+        cards = ''.join(
+            f"<article><img src='{p['cover_image_url']}'><h3>{p['name']}</h3><p>{p['location']}</p></article>"
+            for p in projects.values()
+        )
+        return page('Projects', cards)
+
+    @app.get('/projects/{slug}', response_class=HTMLResponse)
+    async def project_detail(slug: str):
+        await render()
+        project = next((p for p in projects.values() if p['slug'] == slug), None)
+        if project is None:
+            return HTMLResponse(page('Not Found', '<h1>404</h1>'), status_code=404)
+        return page(project['name'], f"<h1>{project['name']}</h1><p>{project['story'] or ''}</p>")
+
+    return app
+
+
+class LocalServer:
+    """Run an ASGI app with uvicorn on a free local port inside the current loop.
+
+    Usage: ``async with LocalServer(app) as base_url: ...``
+    """
+
+    def __init__(self, app, host='127.0.0.1', port=0):
+        self.config = uvicorn.Config(app, host=host, port=port, log_level='warning', lifespan='on')
+        self.server = uvicorn.Server(self.config)
+        self.task = None
+
+    async def __aenter__(self):
+        self.task = asyncio.create_task(self.server.serve())
+        while not self.server.started:
+            if self.task.done():
+                self.task.result()
+            await asyncio.sleep(0.01)
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def __aexit__(self, *exc):
+        self.server.should_exit = True
+        await self.task
+
+
+@asynccontextmanager
+async def offline_proxy(stub):
+    """Serve ``stub`` and backend/server.py in front of it; yields the proxy URL.
+
+    backend/ modules read their configuration at import time, so the
+    environment is set before ``server`` is first imported.
+    """
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    async with LocalServer(stub) as upstream_url:
+        os.environ['NEXTJS_URL'] = upstream_url
+        os.environ['NEXT_PUBLIC_SUPABASE_URL'] = upstream_url
+        for name, value in OFFLINE_ENV.items():
+            os.environ.setdefault(name, value)
+        import server
+
+        async with LocalServer(server.app) as proxy_url:
+            yield proxy_url
+
+
+async def admin_login(client, password=''):
+    """Log in through the proxy and return the signed session cookie.
+
+    The cookie is cleared from ``client`` so only requests that pass it get
+    an admin session.
+    """
+    response = await client.post('/api/admin/login', json={'password': password})
+    response.raise_for_status()
+    cookies = {'admin_auth': response.cookies['admin_auth']}
+    client.cookies.clear()
+    return cookies
+
+
+async def _serve_forever(port, render_delay, seed_projects):
+    async with LocalServer(create_stub_app(render_delay, seed_projects=seed_projects), port=port) as url:
+        print(f"Stub upstream listening on {url}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--render-delay', type=float, default=0.0, help='seconds per page render')
+    parser.add_argument('--seed-projects', type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(_serve_forever(args.port, args.render_delay, args.seed_projects))